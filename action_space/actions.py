@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import sys
+from collections.abc import Mapping
+from dataclasses import FrozenInstanceError
+from types import MappingProxyType
 from typing import Literal
 
 from core.models import DOMState
@@ -8,23 +11,78 @@ from core.models import DOMState
 ActionType = Literal["click", "type", "select", "scroll", "navigate"]
 
 
-@dataclass(frozen=True)
 class Action:
-    action_type: ActionType
-    node_id: str | None = None
-    value: str | None = None
-    metadata: dict[str, str] = field(default_factory=dict)
+    """Immutable action whose canonical key is built once at construction.
 
-    def canonical(self) -> str:
+    Equality and hashing go through the canonical key. Identifiers and values
+    are interned so that repeated candidates share their strings.
+    """
+
+    __slots__ = ("action_type", "node_id", "value", "metadata", "_key", "_hash")
+
+    action_type: ActionType
+    node_id: str | None
+    value: str | None
+    metadata: Mapping[str, str]
+
+    def __init__(
+        self,
+        action_type: ActionType,
+        node_id: str | None = None,
+        value: str | None = None,
+        metadata: Mapping[str, str] | None = None,
+    ) -> None:
+        frozen_metadata = MappingProxyType(
+            {sys.intern(key): sys.intern(item) for key, item in (metadata or {}).items()}
+        )
         metadata_repr = "|".join(
-            f"{key}={value}" for key, value in sorted(self.metadata.items())
+            f"{key}={item}" for key, item in sorted(frozen_metadata.items())
         )
-        return (
-            f"{self.action_type}:"
-            f"{self.node_id or '_'}:"
-            f"{self.value or '_'}:"
+        key = sys.intern(
+            f"{action_type}:"
+            f"{node_id or '_'}:"
+            f"{value or '_'}:"
             f"{metadata_repr}"
         )
+        setter = object.__setattr__
+        setter(self, "action_type", sys.intern(action_type))
+        setter(self, "node_id", sys.intern(node_id) if node_id is not None else None)
+        setter(self, "value", sys.intern(value) if value is not None else None)
+        setter(self, "metadata", frozen_metadata)
+        setter(self, "_key", key)
+        setter(self, "_hash", hash(key))
+
+    def canonical(self) -> str:
+        return self._key
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Action):
+            return NotImplemented
+        return self._key == other._key
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return (
+            f"Action(action_type={self.action_type!r}, node_id={self.node_id!r}, "
+            f"value={self.value!r}, metadata={dict(self.metadata)!r})"
+        )
+
+    def __reduce__(self) -> tuple[type[Action], tuple[object, ...]]:
+        return (Action, (self.action_type, self.node_id, self.value, dict(self.metadata)))
+
+    def __copy__(self) -> Action:
+        return self
+
+    def __deepcopy__(self, memo: dict[int, object]) -> Action:
+        return self
 
 
 class ActionGenerator:
@@ -36,12 +94,9 @@ class ActionGenerator:
     def enumerate(self, state: DOMState) -> list[Action]:
         candidates: list[Action] = []
 
-        for node_id in sorted(state.nodes.keys()):
-            node = state.nodes[node_id]
-            if not node.visible:
-                continue
-
-            if node.interactable and node.tag not in {"input", "textarea", "select"}:
+        for node in state.actionable_nodes():
+            node_id = node.node_id
+            if node.tag not in {"input", "textarea", "select"}:
                 metadata: dict[str, str] = {}
                 if node.attributes.get("destructive") == "true":
                     metadata["destructive"] = "true"
@@ -49,14 +104,14 @@ class ActionGenerator:
                     Action(action_type="click", node_id=node_id, metadata=metadata)
                 )
 
-            if node.tag in {"input", "textarea"} and node.interactable:
+            if node.tag in {"input", "textarea"}:
                 placeholder = node.attributes.get("placeholder", self.default_input_text)
                 value = f"{placeholder}_text"
                 candidates.append(
                     Action(action_type="type", node_id=node_id, value=value)
                 )
 
-            if node.tag == "select" and node.interactable:
+            if node.tag == "select":
                 options = node.attributes.get("options", "")
                 first_option = options.split(",")[0].strip() if options else "option_1"
                 candidates.append(
@@ -0,0 +1,14 @@
+"""Synthetic workloads and a runner for planner throughput and latency."""
+
+from .runner import BenchmarkCase, BenchmarkResult, run_case, run_suite
+from .synthetic import EnvCalls, SyntheticFormEnv, SyntheticSpec
+
+__all__ = [
+    "BenchmarkCase",
+    "BenchmarkResult",
+    "EnvCalls",
+    "SyntheticFormEnv",
+    "SyntheticSpec",
+    "run_case",
+    "run_suite",
+]
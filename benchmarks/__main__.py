@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+from benchmarks.runner import CONFIGS, SPECS, compare, default_cases, run_suite
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Planner throughput and latency benchmarks.")
+    parser.add_argument("--spec", action="append", choices=sorted(SPECS), help="workload (repeatable)")
+    parser.add_argument("--config", action="append", choices=sorted(CONFIGS), help="planner config (repeatable)")
+    parser.add_argument("--simulations", type=int, default=64)
+    parser.add_argument("--episodes", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_suite(
+        default_cases(args.spec, args.config, args.simulations),
+        episodes=args.episodes,
+        measure_memory=not args.no_memory,
+    )
+    if args.baseline is not None:
+        report["comparison"] = compare(json.loads(args.baseline.read_text()), report)
+
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n")
+
+    for result in report["results"]:
+        memory = result["peak_memory_bytes"]
+        peak = f"{memory / 1024:>8.0f} KiB" if memory is not None else f"{'-':>12}"
+        print(
+            f"{result['case']:<24} {result['sims_per_sec']:>9.0f} sims/s"
+            f"  p50 {result['plan_p50_ms']:>8.2f} ms  p99 {result['plan_p99_ms']:>8.2f} ms"
+            f"  peak {peak}"
+            f"  success {result['success_rate']:.2f}"
+        )
+    for case, ratios in report.get("comparison", {}).items():
+        changes = "  ".join(f"{key} x{value:.2f}" for key, value in ratios.items())
+        print(f"{case:<24} {changes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Callable
+
+from action_space import ActionGenerator
+from benchmarks.synthetic import SyntheticFormEnv, SyntheticSpec
+from reward import RewardModel
+from search import MCTSConfig, MCTSPlanner, PriorPolicy
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    spec: SyntheticSpec
+    config: MCTSConfig
+
+
+@dataclass
+class BenchmarkResult:
+    case: str
+    spec: dict[str, object]
+    config: dict[str, object]
+    episodes: int
+    plans: int
+    simulations: int
+    sims_per_sec: float
+    plan_p50_ms: float
+    plan_p99_ms: float
+    peak_memory_bytes: int | None
+    env_calls_per_plan: dict[str, float] = field(default_factory=dict)
+    success_rate: float = 0.0
+
+
+PlannerFactory = Callable[[MCTSConfig], MCTSPlanner]
+
+SPECS: dict[str, SyntheticSpec] = {
+    "small": SyntheticSpec(),
+    "medium": SyntheticSpec(fields=6, distractors=4, destructive=2, pages=2, dom_nodes=500),
+    "large": SyntheticSpec(fields=8, distractors=8, destructive=3, pages=3, dom_nodes=2000),
+}
+CONFIGS: dict[str, dict[str, object]] = {
+    "puct": {},
+    "progressive": {"expansion": "progressive"},
+    "gumbel": {"root_selection": "gumbel"},
+    "cached": {"transition_cache_size": 4096, "deterministic_transitions": True},
+}
+
+
+def build_planner(config: MCTSConfig) -> MCTSPlanner:
+    return MCTSPlanner(
+        action_generator=ActionGenerator(default_input_text="seed"),
+        reward_model=RewardModel(),
+        prior_policy=PriorPolicy(),
+        config=config,
+    )
+
+
+def default_cases(
+    specs: list[str] | None = None,
+    configs: list[str] | None = None,
+    simulations: int = 64,
+) -> list[BenchmarkCase]:
+    """Every combination of the named `SPECS` and `CONFIGS`."""
+    return [
+        BenchmarkCase(
+            name=f"{spec_name}/{config_name}",
+            spec=SPECS[spec_name],
+            config=MCTSConfig(simulations=simulations, seed=0, **CONFIGS[config_name]),
+        )
+        for spec_name in specs or list(SPECS)
+        for config_name in configs or list(CONFIGS)
+    ]
+
+
+def run_case(
+    case: BenchmarkCase,
+    episodes: int = 3,
+    measure_memory: bool = True,
+    planner_factory: PlannerFactory = build_planner,
+) -> BenchmarkResult:
+    """Runs `episodes` re-planning episodes and summarizes every `plan()` call.
+
+    Latencies and throughput come from an untraced pass. When
+    `measure_memory` is set, one more episode runs under `tracemalloc`,
+    which slows it down, to find the peak traced allocation.
+    """
+    samples: list[_PlanSample] = []
+    successes = 0
+    for _ in range(episodes):
+        env = SyntheticFormEnv(case.spec)
+        successes += _run_episode(planner_factory(case.config), env, samples)
+
+    peak_memory = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            _run_episode(planner_factory(case.config), SyntheticFormEnv(case.spec), [])
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    plans = len(samples)
+    plan_seconds = sum(sample.seconds for sample in samples)
+    simulations = sum(sample.simulations for sample in samples)
+    ordered = sorted(sample.seconds for sample in samples)
+    env_calls: dict[str, int] = {}
+    for sample in samples:
+        for name, count in sample.env_calls.items():
+            env_calls[name] = env_calls.get(name, 0) + count
+    return BenchmarkResult(
+        case=case.name,
+        spec=asdict(case.spec),
+        config=asdict(case.config),
+        episodes=episodes,
+        plans=plans,
+        simulations=simulations,
+        sims_per_sec=simulations / plan_seconds if plan_seconds else 0.0,
+        plan_p50_ms=percentile(ordered, 0.5) * 1000,
+        plan_p99_ms=percentile(ordered, 0.99) * 1000,
+        peak_memory_bytes=peak_memory,
+        env_calls_per_plan={
+            name: count / plans if plans else 0.0 for name, count in env_calls.items()
+        },
+        success_rate=successes / episodes if episodes else 0.0,
+    )
+
+
+def run_suite(
+    cases: list[BenchmarkCase],
+    episodes: int = 3,
+    measure_memory: bool = True,
+) -> dict[str, object]:
+    """Runs every case and returns a JSON-serializable report."""
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": [
+            asdict(run_case(case, episodes=episodes, measure_memory=measure_memory))
+            for case in cases
+        ],
+    }
+
+
+def compare(baseline: dict[str, object], report: dict[str, object]) -> dict[str, dict[str, float]]:
+    """Ratios of `report` to `baseline` for the cases both reports contain.
+
+    Above 1.0 is better for sims_per_sec and worse for the latency and memory
+    ratios.
+    """
+    previous = {result["case"]: result for result in baseline["results"]}
+    ratios: dict[str, dict[str, float]] = {}
+    for result in report["results"]:
+        before = previous.get(result["case"])
+        if before is None:
+            continue
+        ratios[result["case"]] = {
+            key: result[key] / before[key]
+            for key in ("sims_per_sec", "plan_p50_ms", "plan_p99_ms", "peak_memory_bytes")
+            if result.get(key) and before.get(key)
+        }
+    return ratios
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(len(ordered) * fraction))
+    return ordered[min(len(ordered), rank) - 1]
+
+
+@dataclass
+class _PlanSample:
+    seconds: float
+    simulations: int
+    env_calls: dict[str, int]
+
+
+def _run_episode(
+    planner: MCTSPlanner,
+    env: SyntheticFormEnv,
+    samples: list[_PlanSample],
+) -> bool:
+    """Plans and executes one action at a time, appending a sample per plan.
+
+    Only calls made while planning count towards `env_calls`.
+    """
+    planner.reset()
+    for _ in range(env.spec.step_limit):
+        if env.is_terminal():
+            break
+        before = env.calls.as_dict()
+        started = time.perf_counter()
+        result = planner.plan(env)
+        seconds = time.perf_counter() - started
+        after = env.calls.as_dict()
+        samples.append(
+            _PlanSample(
+                seconds=seconds,
+                simulations=result.simulations_run,
+                env_calls={name: after[name] - before[name] for name in after},
+            )
+        )
+        if not result.actions:
+            break
+        action = result.actions[0]
+        env.apply(action)
+        planner.advance([action])
+    return env.is_success()
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+from action_space.actions import Action
+from core.models import DOMNode, DOMState, TaskSpec
+from core.persistent import NodeMap
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    """Shape of a generated form flow.
+
+    Every page has `fields` required inputs, `distractors` harmless buttons,
+    `destructive` buttons that end the episode in failure, and an
+    `n_submit` button. It reads "next" on every page but the last. Pressing
+    it with a blank field fails the episode, as in `MockBrowserEnv`. Inert
+    `div`s pad each page to `dom_nodes` nodes. `apply_latency` seconds are
+    slept on every `apply`.
+    """
+
+    fields: int = 2
+    distractors: int = 0
+    destructive: int = 1
+    pages: int = 1
+    dom_nodes: int = 0
+    apply_latency: float = 0.0
+    max_steps: int | None = None
+
+    @property
+    def step_limit(self) -> int:
+        if self.max_steps is not None:
+            return self.max_steps
+        return self.pages * (self.fields + 1) + 6
+
+
+@dataclass
+class EnvCalls:
+    """Env method call counts, shared by an env and all of its clones."""
+
+    observe: int = 0
+    apply: int = 0
+    clone: int = 0
+    snapshot: int = 0
+    restore: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "observe": self.observe,
+            "apply": self.apply,
+            "clone": self.clone,
+            "snapshot": self.snapshot,
+            "restore": self.restore,
+        }
+
+
+class SyntheticFormEnv:
+    """Deterministic multi-page form env generated from a `SyntheticSpec`.
+
+    Each page's static nodes live in one `NodeMap`, shared with clones, and
+    each observation copies it, so large pages cost little to observe. Calls are counted in `calls`.
+    That includes calls on clones, but not on clones pickled into worker
+    processes.
+    """
+
+    def __init__(self, spec: SyntheticSpec = SyntheticSpec(), calls: EnvCalls | None = None) -> None:
+        self.spec = spec
+        self.task = TaskSpec(objective=f"Fill and submit a {spec.pages}-page form")
+        self.calls = calls or EnvCalls()
+        self._pages: dict[int, NodeMap] = {}
+        self._step = 0
+        self._page = 0
+        self._success = False
+        self._failed = False
+        self._values: dict[str, str] = {}
+        self._history: list[str] = []
+        self._undo_log: list[tuple[int, int, bool, bool, str | None, str]] = []
+
+    def clone(self) -> SyntheticFormEnv:
+        self.calls.clone += 1
+        env = SyntheticFormEnv.__new__(SyntheticFormEnv)
+        env.spec = self.spec
+        env.task = self.task
+        env.calls = self.calls
+        env._pages = self._pages
+        env._step = self._step
+        env._page = self._page
+        env._success = self._success
+        env._failed = self._failed
+        env._values = dict(self._values)
+        env._history = list(self._history)
+        env._undo_log = list(self._undo_log)
+        return env
+
+    def snapshot(self) -> int:
+        self.calls.snapshot += 1
+        return len(self._undo_log)
+
+    def restore(self, token: int) -> None:
+        self.calls.restore += 1
+        if not 0 <= token <= len(self._undo_log):
+            raise ValueError(f"Unknown snapshot token: {token!r}")
+
+        while len(self._undo_log) > token:
+            step, page, success, failed, field_id, value = self._undo_log.pop()
+            self._step = step
+            self._page = page
+            self._success = success
+            self._failed = failed
+            self._history.pop()
+            if field_id is not None:
+                self._values[field_id] = value
+
+    def observe(self) -> DOMState:
+        self.calls.observe += 1
+        field_ids = self._field_ids()
+        status = "success" if self._success else "failed" if self._failed else "pending"
+
+        nodes = self._page_nodes().copy()
+        for field_id in field_ids:
+            nodes[field_id] = DOMNode(
+                node_id=field_id,
+                tag="input",
+                text=self._values.get(field_id, ""),
+                attributes={"placeholder": field_id, "required": "true"},
+                interactable=True,
+            )
+        nodes["n_status"] = DOMNode(node_id="n_status", tag="div", text=status)
+
+        filled = {field_id: bool(self._values.get(field_id, "").strip()) for field_id in field_ids}
+        metadata = {
+            "all_required_filled": "true" if all(filled.values()) else "false",
+            "page": str(self._page),
+            "success": "true" if self._success else "false",
+            "scrollable": "true",
+        }
+        for field_id, is_filled in filled.items():
+            metadata[f"filled:{field_id}"] = "true" if is_filled else "false"
+
+        return DOMState(
+            url=f"https://synthetic.local/form/{self._page}",
+            nodes=nodes,
+            interaction_history=list(self._history),
+            metadata=metadata,
+            step=self._step,
+        )
+
+    def apply(self, action: Action) -> DOMState:
+        self.calls.apply += 1
+        if self.spec.apply_latency:
+            time.sleep(self.spec.apply_latency)
+        if self.is_terminal():
+            return self.observe()
+
+        field_ids = self._field_ids()
+        field_id = action.node_id if action.node_id in field_ids else None
+        self._undo_log.append(
+            (
+                self._step,
+                self._page,
+                self._success,
+                self._failed,
+                field_id,
+                self._values.get(field_id, "") if field_id is not None else "",
+            )
+        )
+        self._step += 1
+        self._history.append(action.canonical())
+
+        if action.action_type == "type" and field_id is not None:
+            self._values[field_id] = (action.value or "").strip()
+
+        if action.action_type == "click":
+            if action.node_id == "n_submit":
+                if not all(self._values.get(field, "").strip() for field in field_ids):
+                    self._failed = True
+                elif self._page == self.spec.pages - 1:
+                    self._success = True
+                else:
+                    self._page += 1
+            elif action.node_id is not None and action.node_id.startswith("n_cancel"):
+                self._failed = True
+
+        if self._step >= self.spec.step_limit and not self._success:
+            self._failed = True
+
+        return self.observe()
+
+    def is_terminal(self) -> bool:
+        return self._success or self._failed
+
+    def is_success(self) -> bool:
+        return self._success
+
+    def _field_ids(self) -> list[str]:
+        return [f"n_p{self._page}_f{index}" for index in range(self.spec.fields)]
+
+    def _page_nodes(self) -> NodeMap:
+        """Padding, buttons and form of the current page; built once per page."""
+        nodes = self._pages.get(self._page)
+        if nodes is not None:
+            return nodes
+
+        spec = self.spec
+        fixed = spec.fields + spec.distractors + spec.destructive + 3
+        nodes = NodeMap(
+            (f"pad{index:06d}", DOMNode(node_id=f"pad{index:06d}", tag="div", text=f"row {index}"))
+            for index in range(max(0, spec.dom_nodes - fixed))
+        )
+        form_children = self._field_ids()
+        for index in range(spec.distractors):
+            node_id = f"n_link{index}"
+            nodes[node_id] = DOMNode(node_id=node_id, tag="button", text=f"more {index}", interactable=True)
+            form_children.append(node_id)
+        for index in range(spec.destructive):
+            node_id = f"n_cancel{index}"
+            nodes[node_id] = DOMNode(
+                node_id=node_id,
+                tag="button",
+                text="cancel",
+                attributes={"destructive": "true"},
+                interactable=True,
+            )
+            form_children.append(node_id)
+        nodes["n_submit"] = DOMNode(
+            node_id="n_submit",
+            tag="button",
+            text="submit" if self._page == spec.pages - 1 else "next",
+            interactable=True,
+        )
+        form_children.append("n_submit")
+        nodes["n_form"] = DOMNode(node_id="n_form", tag="form", children=form_children)
+        self._pages[self._page] = nodes
+        return nodes
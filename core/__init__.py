@@ -1,5 +1,18 @@
 """Shared models and interfaces for DOM-MCTS baseline."""
 
+from .indexes import DOMIndex
+from .interfaces import AsyncBrowserEnv, BrowserEnv, SnapshotEnv
 from .models import DOMNode, DOMState, RewardBreakdown, TaskSpec
+from .persistent import NodeMap
 
-__all__ = ["DOMNode", "DOMState", "RewardBreakdown", "TaskSpec"]
+__all__ = [
+    "AsyncBrowserEnv",
+    "BrowserEnv",
+    "DOMIndex",
+    "DOMNode",
+    "DOMState",
+    "NodeMap",
+    "RewardBreakdown",
+    "SnapshotEnv",
+    "TaskSpec",
+]
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from core.persistent import NodeMap
+
+if TYPE_CHECKING:
+    from core.models import DOMNode
+
+_Entries = dict[str, "DOMNode"]
+
+
+class DOMIndex:
+    """Secondary lookups over a state's nodes.
+
+    Every index is a plain dict keyed by node id, filled in one pass over the
+    sorted nodes. `copy()` shares the dicts, and whichever side writes first
+    copies them. Entries added out of node-id order are re-sorted on the next
+    lookup. `parents` maps a child id to the node that lists it in
+    `children`.
+    """
+
+    __slots__ = ("actionable", "required", "by_tag", "by_role", "parents", "_shared", "_unsorted")
+
+    def __init__(self) -> None:
+        self.actionable: _Entries = {}
+        self.required: _Entries = {}
+        self.by_tag: dict[str, _Entries] = {}
+        self.by_role: dict[str, _Entries] = {}
+        self.parents: _Entries = {}
+        self._shared = False
+        self._unsorted: set[tuple[str, str | None]] = set()
+
+    @classmethod
+    def build(cls, nodes: NodeMap) -> DOMIndex:
+        index = cls()
+        actionable = index.actionable
+        required = index.required
+        by_tag = index.by_tag
+        by_role = index.by_role
+        parents = index.parents
+        for node_id, node in nodes.items():
+            if node.visible and node.interactable:
+                actionable[node_id] = node
+            if node.attributes.get("required") == "true":
+                required[node_id] = node
+            tagged = by_tag.get(node.tag)
+            if tagged is None:
+                tagged = by_tag[node.tag] = {}
+            tagged[node_id] = node
+            if node.role is not None:
+                by_role.setdefault(node.role, {})[node_id] = node
+            for child_id in node.children:
+                parents[child_id] = node
+        return index
+
+    def copy(self) -> DOMIndex:
+        index = DOMIndex.__new__(DOMIndex)
+        index.actionable = self.actionable
+        index.required = self.required
+        index.by_tag = self.by_tag
+        index.by_role = self.by_role
+        index.parents = self.parents
+        index._unsorted = set(self._unsorted)
+        index._shared = self._shared = True
+        return index
+
+    def actionable_nodes(self) -> _Entries:
+        return self._ordered("actionable")
+
+    def required_nodes(self) -> _Entries:
+        return self._ordered("required")
+
+    def nodes_by_tag(self, tag: str) -> _Entries:
+        return self._ordered("by_tag", tag)
+
+    def nodes_by_role(self, role: str) -> _Entries:
+        return self._ordered("by_role", role)
+
+    def add(self, node: DOMNode) -> None:
+        self._own()
+        if node.visible and node.interactable:
+            self._put(self.actionable, node, ("actionable", None))
+        if node.attributes.get("required") == "true":
+            self._put(self.required, node, ("required", None))
+        self._put(self.by_tag.setdefault(node.tag, {}), node, ("by_tag", node.tag))
+        if node.role is not None:
+            self._put(self.by_role.setdefault(node.role, {}), node, ("by_role", node.role))
+        for child_id in node.children:
+            self.parents[child_id] = node
+
+    def discard(self, node: DOMNode) -> None:
+        self._own()
+        node_id = node.node_id
+        self.actionable.pop(node_id, None)
+        self.required.pop(node_id, None)
+        _discard_grouped(self.by_tag, node.tag, node_id)
+        if node.role is not None:
+            _discard_grouped(self.by_role, node.role, node_id)
+        for child_id in node.children:
+            parent = self.parents.get(child_id)
+            if parent is not None and parent.node_id == node_id:
+                del self.parents[child_id]
+
+    def _own(self) -> None:
+        if not self._shared:
+            return
+        self.actionable = dict(self.actionable)
+        self.required = dict(self.required)
+        self.by_tag = {tag: dict(entries) for tag, entries in self.by_tag.items()}
+        self.by_role = {role: dict(entries) for role, entries in self.by_role.items()}
+        self.parents = dict(self.parents)
+        self._shared = False
+
+    def _put(self, entries: _Entries, node: DOMNode, name: tuple[str, str | None]) -> None:
+        node_id = node.node_id
+        if node_id not in entries and entries and node_id < next(reversed(entries)):
+            self._unsorted.add(name)
+        entries[node_id] = node
+
+    def _ordered(self, attribute: str, group: str | None = None) -> _Entries:
+        if group is None:
+            entries = getattr(self, attribute)
+        else:
+            entries = getattr(self, attribute).get(group)
+            if entries is None:
+                return {}
+        name = (attribute, group)
+        if name not in self._unsorted:
+            return entries
+
+        # Sorting keeps the same entries, so replacing a dict that a copy
+        # still shares is harmless.
+        entries = dict(sorted(entries.items()))
+        if group is None:
+            setattr(self, attribute, entries)
+        else:
+            getattr(self, attribute)[group] = entries
+        self._unsorted.discard(name)
+        return entries
+
+
+def _discard_grouped(groups: dict[str, _Entries], key: str, node_id: str) -> None:
+    entries = groups.get(key)
+    if entries is None:
+        return
+    entries.pop(node_id, None)
+    if not entries:
+        del groups[key]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Protocol, runtime_checkable
+
+from core.models import DOMState
+
+if TYPE_CHECKING:
+    from action_space.actions import Action
+
+
+@runtime_checkable
+class BrowserEnv(Protocol):
+    """Synchronous environment interface consumed by the planner and runner."""
+
+    def observe(self) -> DOMState: ...
+
+    def apply(self, action: Action) -> DOMState: ...
+
+    def clone(self) -> BrowserEnv: ...
+
+    def is_terminal(self) -> bool: ...
+
+    def is_success(self) -> bool: ...
+
+
+@runtime_checkable
+class SnapshotEnv(BrowserEnv, Protocol):
+    """Environment that can rewind itself instead of being cloned.
+
+    `snapshot()` returns an opaque token for the current state and
+    `restore(token)` rewinds to it. A token stays valid until the env is
+    restored to an earlier snapshot.
+    """
+
+    def snapshot(self) -> object: ...
+
+    def restore(self, token: object) -> None: ...
+
+
+@runtime_checkable
+class AsyncBrowserEnv(Protocol):
+    """Awaitable variant of BrowserEnv for async-native browser drivers."""
+
+    async def observe(self) -> DOMState: ...
+
+    async def apply(self, action: Action) -> DOMState: ...
+
+    async def clone(self) -> AsyncBrowserEnv: ...
+
+    async def is_terminal(self) -> bool: ...
+
+    async def is_success(self) -> bool: ...
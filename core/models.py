@@ -1,54 +1,223 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import hashlib
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field, fields, replace
+from types import MappingProxyType
 
+from core.indexes import DOMIndex
+from core.persistent import NodeMap
 
-@dataclass
+
+def _stable_hash(parts: list[str]) -> int:
+    payload = "".join(f"{len(part)}:{part}" for part in parts)
+    digest = hashlib.blake2b(payload.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+@dataclass(frozen=True)
 class DOMNode:
-    """Canonical, model-friendly DOM node representation."""
+    """Canonical, model-friendly DOM node representation.
+
+    Nodes are immutable so that states can share them: `attributes` is
+    stored as a read-only mapping and `children` as a tuple, whatever was
+    passed in. Derive edited nodes with `dataclasses.replace` or
+    `DOMState.update_node`.
+    """
 
     node_id: str
     tag: str
     text: str = ""
-    attributes: dict[str, str] = field(default_factory=dict)
+    attributes: Mapping[str, str] = field(default_factory=dict)
     visible: bool = True
     interactable: bool = False
     role: str | None = None
-    children: list[str] = field(default_factory=list)
+    children: tuple[str, ...] = ()
+    _content_hash: int | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "attributes", MappingProxyType(dict(self.attributes)))
+        object.__setattr__(self, "children", tuple(self.children))
+
+    def __reduce__(self) -> tuple[type[DOMNode], tuple[object, ...]]:
+        return (
+            DOMNode,
+            (
+                self.node_id,
+                self.tag,
+                self.text,
+                dict(self.attributes),
+                self.visible,
+                self.interactable,
+                self.role,
+                self.children,
+            ),
+        )
+
+    def __copy__(self) -> DOMNode:
+        return self
+
+    def __deepcopy__(self, memo: dict[int, object]) -> DOMNode:
+        return self
+
+    def content_hash(self) -> int:
+        """Hash of this node's own fields, computed once."""
+        if self._content_hash is None:
+            object.__setattr__(
+                self,
+                "_content_hash",
+                _stable_hash(
+                    [
+                        self.node_id,
+                        self.tag,
+                        self.text,
+                        "1" if self.visible else "0",
+                        "1" if self.interactable else "0",
+                        self.role if self.role is not None else "\x00",
+                        *self.children,
+                        "\x00",
+                        *(
+                            f"{key}={self.attributes[key]}"
+                            for key in sorted(self.attributes)
+                        ),
+                    ]
+                ),
+            )
+        return self._content_hash
+
+    def copy(self) -> DOMNode:
+        """Nodes are immutable, so a copy is the node itself."""
+        return self
+
+
+_NODE_FIELDS = frozenset(item.name for item in fields(DOMNode) if item.init)
 
 
 @dataclass
 class DOMState:
-    """Structured environment state used by search."""
+    """Structured environment state used by search.
+
+    `nodes` is a persistent `NodeMap`; any mapping passed in is converted.
+    `clone()` shares every node with the original, which is safe because
+    `DOMNode` is immutable. Edit a state through `set_node`, `update_node`
+    and `remove_node`, which copy only the blocks leading to the touched node
+    and keep `fingerprint()` and the lookup indexes current.
+
+    The indexes behind `actionable_nodes()`, `nodes_by_tag()`,
+    `nodes_by_role()`, `required_nodes()` and `parent_of()` are built on first
+    use and shared copy-on-write with clones. Writes made to `nodes` directly
+    are detected through `NodeMap.version` and rebuild them on the next
+    lookup.
+    """
 
     url: str
-    nodes: dict[str, DOMNode]
+    nodes: NodeMap
     focused_node_id: str | None = None
     interaction_history: list[str] = field(default_factory=list)
     metadata: dict[str, str] = field(default_factory=dict)
     step: int = 0
+    _index: DOMIndex | None = field(default=None, init=False, repr=False, compare=False)
+    _index_version: int = field(default=-1, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.nodes, NodeMap):
+            self.nodes = NodeMap(self.nodes)
 
     def clone(self) -> "DOMState":
-        return DOMState(
+        state = DOMState(
             url=self.url,
-            nodes={
-                node_id: DOMNode(
-                    node_id=node.node_id,
-                    tag=node.tag,
-                    text=node.text,
-                    attributes=dict(node.attributes),
-                    visible=node.visible,
-                    interactable=node.interactable,
-                    role=node.role,
-                    children=list(node.children),
-                )
-                for node_id, node in self.nodes.items()
-            },
+            nodes=self.nodes.copy(),
             focused_node_id=self.focused_node_id,
             interaction_history=list(self.interaction_history),
             metadata=dict(self.metadata),
             step=self.step,
         )
+        if self._index_is_current():
+            state._index = self._index.copy()
+            state._index_version = state.nodes.version
+        return state
+
+    def fingerprint(self) -> int:
+        """Stable 64-bit content hash; history is compared as a multiset."""
+        return _stable_hash(
+            [
+                self.url,
+                self.focused_node_id or "",
+                str(self.step),
+                str(self.nodes.digest()),
+                *sorted(self.interaction_history),
+                "\x00",
+                *(f"{key}={self.metadata[key]}" for key in sorted(self.metadata)),
+            ]
+        )
+
+    def invalidate_fingerprint(self) -> None:
+        self.nodes.invalidate_digest()
+
+    def invalidate_indexes(self) -> None:
+        """Drops the lookup indexes; they are rebuilt on the next lookup."""
+        self._index = None
+
+    def set_node(self, node: DOMNode) -> None:
+        previous = self.nodes.get(node.node_id)
+        current = self._index_is_current()
+        self.nodes[node.node_id] = node
+        self._reindex(current, previous, node)
+
+    def update_node(self, node_id: str, **changes: object) -> DOMNode:
+        previous = self.nodes[node_id]
+        for name in changes:
+            if name not in _NODE_FIELDS:
+                raise AttributeError(f"DOMNode has no field {name!r}")
+        node = replace(previous, **changes)
+        current = self._index_is_current()
+        self.nodes[node_id] = node
+        self._reindex(current, previous, node)
+        return node
+
+    def remove_node(self, node_id: str) -> DOMNode:
+        current = self._index_is_current()
+        node = self.nodes.pop(node_id)
+        self._reindex(current, node, None)
+        return node
+
+    def actionable_nodes(self) -> Iterator[DOMNode]:
+        """Visible, interactable nodes in node-id order."""
+        return iter(self._indexes().actionable_nodes().values())
+
+    def nodes_by_tag(self, tag: str) -> Iterator[DOMNode]:
+        return iter(self._indexes().nodes_by_tag(tag).values())
+
+    def nodes_by_role(self, role: str) -> Iterator[DOMNode]:
+        return iter(self._indexes().nodes_by_role(role).values())
+
+    def required_nodes(self) -> Iterator[DOMNode]:
+        """Nodes marked `required="true"`, visible or not, in node-id order."""
+        return iter(self._indexes().required_nodes().values())
+
+    def parent_of(self, node_id: str) -> DOMNode | None:
+        """The node whose `children` lists `node_id`, if any."""
+        return self._indexes().parents.get(node_id)
+
+    def _indexes(self) -> DOMIndex:
+        if not self._index_is_current():
+            self._index = DOMIndex.build(self.nodes)
+            self._index_version = self.nodes.version
+        return self._index
+
+    def _index_is_current(self) -> bool:
+        return self._index is not None and self._index_version == self.nodes.version
+
+    def _reindex(self, current: bool, previous: DOMNode | None, node: DOMNode | None) -> None:
+        """Applies one write to indexes that were current before it, or drops them."""
+        if not current:
+            self._index = None
+            return
+        if previous is not None:
+            self._index.discard(previous)
+        if node is not None:
+            self._index.add(node)
+        self._index_version = self.nodes.version
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from itertools import count
+from collections.abc import (
+    ItemsView,
+    Iterable,
+    Iterator,
+    KeysView,
+    Mapping,
+    MutableMapping,
+    ValuesView,
+)
+from operator import itemgetter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core.models import DOMNode
+
+_HASH_MASK = (1 << 64) - 1
+_MAX_ENTRIES = 64
+_BUILD_ENTRIES = 32
+_MISSING = object()
+_VERSIONS = count()
+
+
+class _Leaf:
+    __slots__ = ("keys", "values", "owner")
+
+    def __init__(self, keys: list[str], values: list[DOMNode], owner: object) -> None:
+        self.keys = keys
+        self.values = values
+        self.owner = owner
+
+
+class _Branch:
+    __slots__ = ("keys", "children", "owner")
+
+    def __init__(
+        self,
+        keys: list[str],
+        children: list[_Leaf | _Branch],
+        owner: object,
+    ) -> None:
+        # keys[i] is the smallest key stored under children[i].
+        self.keys = keys
+        self.children = children
+        self.owner = owner
+
+
+class NodeMap(MutableMapping[str, "DOMNode"]):
+    """Persistent, key-sorted node mapping with O(1) copies.
+
+    Entries live in a B-tree whose blocks are shared between copies. A write
+    copies only the blocks on the path to the touched key, unless this map
+    already owns them. Iteration is always in sorted node-id order. The map
+    also keeps the running sum of node content hashes used by
+    `DOMState.fingerprint()`.
+
+    Deletions never merge underfull blocks; lookups stay correct, and
+    `NodeMap(existing)` rebuilds a compact tree when that matters.
+
+    `version` changes on every write and is unique across maps, so state
+    derived from the contents can tell whether it is still current.
+    """
+
+    __slots__ = ("_root", "_size", "_owner", "_digest", "_version")
+
+    def __init__(self, items: Mapping[str, DOMNode] | Iterable[tuple[str, DOMNode]] = ()) -> None:
+        pairs = items.items() if isinstance(items, Mapping) else items
+        entries = sorted(pairs, key=itemgetter(0))
+        keys: list[str] = []
+        values: list[DOMNode] = []
+        for key, value in entries:
+            # The sort is stable, so the last duplicate wins, as in a dict.
+            if keys and keys[-1] == key:
+                values[-1] = value
+            else:
+                keys.append(key)
+                values.append(value)
+        del entries
+
+        self._owner = object()
+        self._root = self._build(keys, values)
+        self._size = len(keys)
+        self._digest: int | None = None
+        self._version = next(_VERSIONS)
+
+    def _build(self, keys: list[str], values: list[DOMNode]) -> _Leaf | _Branch:
+        if len(keys) <= _MAX_ENTRIES:
+            return _Leaf(keys, values, self._owner)
+
+        level: list[_Leaf | _Branch] = [
+            _Leaf(
+                keys[start : start + _BUILD_ENTRIES],
+                values[start : start + _BUILD_ENTRIES],
+                self._owner,
+            )
+            for start in range(0, len(keys), _BUILD_ENTRIES)
+        ]
+        while len(level) > 1:
+            level = [
+                _Branch(
+                    [child.keys[0] for child in level[start : start + _BUILD_ENTRIES]],
+                    level[start : start + _BUILD_ENTRIES],
+                    self._owner,
+                )
+                for start in range(0, len(level), _BUILD_ENTRIES)
+            ]
+        return level[0]
+
+    def copy(self) -> NodeMap:
+        clone = NodeMap.__new__(NodeMap)
+        clone._root = self._root
+        clone._size = self._size
+        clone._digest = self._digest
+        clone._version = self._version
+        clone._owner = object()
+        # Blocks owned so far are now shared, so both sides copy before writing.
+        self._owner = object()
+        return clone
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def __reduce__(self) -> tuple[type[NodeMap], tuple[list[tuple[str, DOMNode]]]]:
+        # Versions are only unique within a process, so unpickling rebuilds.
+        return NodeMap, (list(self.items()),)
+
+    def __iter__(self) -> Iterator[str]:
+        for leaf in self._leaves():
+            yield from leaf.keys
+
+    def __reversed__(self) -> Iterator[str]:
+        for leaf in self._leaves(reverse=True):
+            yield from reversed(leaf.keys)
+
+    def keys(self) -> _Keys:
+        return _Keys(self)
+
+    def items(self) -> _Items:
+        return _Items(self)
+
+    def values(self) -> _Values:
+        return _Values(self)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key: str) -> DOMNode:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: object = None) -> object:
+        node = self._root
+        while isinstance(node, _Branch):
+            index = bisect_right(node.keys, key) - 1
+            if index < 0:
+                return default
+            node = node.children[index]
+        index = bisect_left(node.keys, key)
+        if index < len(node.keys) and node.keys[index] == key:
+            return node.values[index]
+        return default
+
+    def __setitem__(self, key: str, value: DOMNode) -> None:
+        previous, split = self._insert(self._root, key, value)
+        if split is not None:
+            left = self._root
+            self._root = _Branch([left.keys[0], split.keys[0]], [left, split], self._owner)
+
+        self._version = next(_VERSIONS)
+        if previous is _MISSING:
+            self._size += 1
+        if self._digest is not None:
+            delta = value.content_hash()
+            if previous is not _MISSING:
+                delta -= previous.content_hash()
+            self._digest = (self._digest + delta) & _HASH_MASK
+
+    def __delitem__(self, key: str) -> None:
+        removed = self._delete(self._root, key)
+        if removed is _MISSING:
+            raise KeyError(key)
+
+        self._version = next(_VERSIONS)
+        self._size -= 1
+        root = self._root
+        while isinstance(root, _Branch) and len(root.children) == 1:
+            root = root.children[0]
+        if isinstance(root, _Branch) and not root.children:
+            root = _Leaf([], [], self._owner)
+        self._root = root
+
+        if self._digest is not None:
+            self._digest = (self._digest - removed.content_hash()) & _HASH_MASK
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, NodeMap) and other._root is self._root:
+            return True
+        return super().__eq__(other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"NodeMap({dict(self.items())!r})"
+
+    def digest(self) -> int:
+        """Order-independent sum of node content hashes, kept up to date on writes."""
+        if self._digest is None:
+            digest = 0
+            for leaf in self._leaves():
+                for value in leaf.values:
+                    digest += value.content_hash()
+            self._digest = digest & _HASH_MASK
+        return self._digest
+
+    def invalidate_digest(self) -> None:
+        self._digest = None
+
+    def shares_structure_with(self, other: NodeMap) -> int:
+        """Number of leaf blocks physically shared with `other`."""
+        mine = {id(leaf) for leaf in self._leaves()}
+        return sum(1 for leaf in other._leaves() if id(leaf) in mine)
+
+    def _leaves(self, reverse: bool = False) -> Iterator[_Leaf]:
+        stack: list[_Leaf | _Branch] = [self._root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, _Leaf):
+                yield node
+            else:
+                stack.extend(node.children if reverse else reversed(node.children))
+
+    def _writable(self, node: _Leaf | _Branch) -> _Leaf | _Branch:
+        if node.owner is self._owner:
+            return node
+        if isinstance(node, _Leaf):
+            return _Leaf(list(node.keys), list(node.values), self._owner)
+        return _Branch(list(node.keys), list(node.children), self._owner)
+
+    def _insert(
+        self,
+        node: _Leaf | _Branch,
+        key: str,
+        value: DOMNode,
+    ) -> tuple[object, _Leaf | _Branch | None]:
+        """Writes `key` below `node` and returns (previous value, split sibling).
+
+        `node` must already be writable, except for the root, which is made
+        writable here.
+        """
+        if node is self._root:
+            node = self._writable(node)
+            self._root = node
+
+        if isinstance(node, _Leaf):
+            index = bisect_left(node.keys, key)
+            if index < len(node.keys) and node.keys[index] == key:
+                previous = node.values[index]
+                node.values[index] = value
+                return previous, None
+            node.keys.insert(index, key)
+            node.values.insert(index, value)
+            return _MISSING, self._split(node)
+
+        index = max(bisect_right(node.keys, key) - 1, 0)
+        child = self._writable(node.children[index])
+        node.children[index] = child
+        previous, split = self._insert(child, key, value)
+        node.keys[index] = child.keys[0]
+        if split is not None:
+            node.keys.insert(index + 1, split.keys[0])
+            node.children.insert(index + 1, split)
+        return previous, self._split(node)
+
+    def _split(self, node: _Leaf | _Branch) -> _Leaf | _Branch | None:
+        if len(node.keys) <= _MAX_ENTRIES:
+            return None
+        middle = len(node.keys) // 2
+        if isinstance(node, _Leaf):
+            sibling: _Leaf | _Branch = _Leaf(
+                node.keys[middle:], node.values[middle:], self._owner
+            )
+            del node.values[middle:]
+        else:
+            sibling = _Branch(node.keys[middle:], node.children[middle:], self._owner)
+            del node.children[middle:]
+        del node.keys[middle:]
+        return sibling
+
+    def _delete(self, node: _Leaf | _Branch, key: str) -> object:
+        if node is self._root:
+            if not self._locate(node, key):
+                return _MISSING
+            node = self._writable(node)
+            self._root = node
+
+        if isinstance(node, _Leaf):
+            index = bisect_left(node.keys, key)
+            if index == len(node.keys) or node.keys[index] != key:
+                return _MISSING
+            del node.keys[index]
+            return node.values.pop(index)
+
+        index = bisect_right(node.keys, key) - 1
+        if index < 0:
+            return _MISSING
+        child = self._writable(node.children[index])
+        node.children[index] = child
+        removed = self._delete(child, key)
+        if not child.keys:
+            del node.keys[index]
+            del node.children[index]
+        else:
+            node.keys[index] = child.keys[0]
+        return removed
+
+    def _locate(self, node: _Leaf | _Branch, key: str) -> bool:
+        while isinstance(node, _Branch):
+            index = bisect_right(node.keys, key) - 1
+            if index < 0:
+                return False
+            node = node.children[index]
+        index = bisect_left(node.keys, key)
+        return index < len(node.keys) and node.keys[index] == key
+
+
+# Views that walk the leaves directly and, like dict views, also iterate in reverse.
+class _Keys(KeysView[str]):
+    def __reversed__(self) -> Iterator[str]:
+        return reversed(self._mapping)
+
+
+class _Items(ItemsView[str, "DOMNode"]):
+    def __iter__(self) -> Iterator[tuple[str, DOMNode]]:
+        for leaf in self._mapping._leaves():
+            yield from zip(leaf.keys, leaf.values)
+
+    def __reversed__(self) -> Iterator[tuple[str, DOMNode]]:
+        for leaf in self._mapping._leaves(reverse=True):
+            yield from zip(reversed(leaf.keys), reversed(leaf.values))
+
+
+class _Values(ValuesView["DOMNode"]):
+    def __iter__(self) -> Iterator[DOMNode]:
+        for leaf in self._mapping._leaves():
+            yield from leaf.values
+
+    def __reversed__(self) -> Iterator[DOMNode]:
+        for leaf in self._mapping._leaves(reverse=True):
+            yield from reversed(leaf.values)
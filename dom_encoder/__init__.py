@@ -1,5 +1,6 @@
 """DOM encoding and canonicalization utilities."""
 
-from .encoder import DOMEncoder
+from .compactor import CompactDOM, DOMCompactor
+from .encoder import DOMEncoder, iter_jsonl_snapshot
 
-__all__ = ["DOMEncoder"]
+__all__ = ["CompactDOM", "DOMCompactor", "DOMEncoder", "iter_jsonl_snapshot"]
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+
+from action_space.actions import Action
+from core.models import DOMNode, DOMState
+from core.persistent import NodeMap
+
+# Attributes read by ActionGenerator, PriorPolicy and RewardModel.
+SEARCH_ATTRIBUTES = frozenset({"placeholder", "options", "required", "destructive"})
+WRAPPER_TAGS = frozenset(
+    {"div", "span", "section", "article", "main", "header", "footer", "nav", "aside"}
+)
+
+
+@dataclass
+class CompactDOM:
+    """A compacted state plus the id mappings needed to act on the real page.
+
+    `to_original` maps every compact node id back to the page's id.
+    `to_compact` maps original ids to compact ones, and maps each collapsed
+    wrapper to the node that replaced it.
+    """
+
+    state: DOMState
+    to_original: dict[str, str] = field(default_factory=dict)
+    to_compact: dict[str, str] = field(default_factory=dict)
+
+    def original_action(self, action: Action) -> Action:
+        """Rewrites an action chosen on the compact state for execution."""
+        if action.node_id is None or action.node_id not in self.to_original:
+            return action
+        return Action(
+            action_type=action.action_type,
+            node_id=self.to_original[action.node_id],
+            value=action.value,
+            metadata=dict(action.metadata),
+        )
+
+
+class DOMCompactor:
+    """Shrinks an encoded state to what search reads.
+
+    Invisible nodes are dropped with their whole subtree. A non-interactive
+    wrapper (`wrapper_tags`, no role, no text) with a single remaining child
+    is replaced by that child. Non-interactive leaves without a role are
+    dropped unless `keep_text_nodes` is set. Kept nodes retain only the
+    `attributes` in `kept_attributes`, and only interactable nodes keep
+    their text.
+
+    With `rename_ids`, nodes get short sequential ids in document order,
+    except those in `kept_ids`. Pass the ids the search models key on, e.g.
+    `RewardModel.SUBMIT_NODE_ID`. Metadata
+    keys ending in ":<node id>", the focused id and the node ids in the
+    interaction history are rewritten to match.
+    """
+
+    def __init__(
+        self,
+        kept_attributes: frozenset[str] = SEARCH_ATTRIBUTES,
+        wrapper_tags: frozenset[str] = WRAPPER_TAGS,
+        keep_text_nodes: bool = False,
+        rename_ids: bool = False,
+        kept_ids: frozenset[str] = frozenset(),
+    ) -> None:
+        self.kept_attributes = kept_attributes
+        self.wrapper_tags = wrapper_tags
+        self.keep_text_nodes = keep_text_nodes
+        self.rename_ids = rename_ids
+        self.kept_ids = kept_ids
+
+    def compact(self, state: DOMState) -> CompactDOM:
+        roots = [node for node in state.nodes.values() if state.parent_of(node.node_id) is None]
+        slots: list[DOMNode | None] = []
+        aliases: dict[str, str] = {}
+        for root in roots:
+            self._compact_subtree(state, root, slots, aliases, set())
+        kept = [node for node in slots if node is not None]
+
+        renames = {node.node_id: node.node_id for node in kept}
+        if self.rename_ids:
+            renames = {
+                node.node_id: node.node_id if node.node_id in self.kept_ids else f"c{index}"
+                for index, node in enumerate(kept)
+            }
+
+        nodes = NodeMap(
+            (
+                renames[node.node_id],
+                replace(
+                    node,
+                    node_id=renames[node.node_id],
+                    children=[renames[child] for child in node.children],
+                ),
+            )
+            for node in kept
+        )
+        to_compact = {original: renames[original] for original in renames}
+        for wrapper_id, survivor_id in aliases.items():
+            to_compact[wrapper_id] = renames[survivor_id]
+
+        compact_state = DOMState(
+            url=state.url,
+            nodes=nodes,
+            focused_node_id=(
+                to_compact.get(state.focused_node_id)
+                if state.focused_node_id is not None
+                else None
+            ),
+            interaction_history=[
+                self._rename_action_key(key, renames) for key in state.interaction_history
+            ],
+            metadata=dict(
+                sorted(
+                    (self._rename_metadata_key(key, renames), value)
+                    for key, value in state.metadata.items()
+                )
+            ),
+            step=state.step,
+        )
+        return CompactDOM(
+            state=compact_state,
+            to_original={compact: original for original, compact in renames.items()},
+            to_compact=to_compact,
+        )
+
+    def _compact_subtree(
+        self,
+        state: DOMState,
+        node: DOMNode,
+        slots: list[DOMNode | None],
+        aliases: dict[str, str],
+        visiting: set[str],
+    ) -> str | None:
+        """Appends `node`'s subtree to `slots` in document order, None for dropped nodes.
+
+        Returns the id that stands in for `node` in its parent's children,
+        or None when the whole subtree is dropped.
+        """
+        if not node.visible or node.node_id in visiting:
+            return None
+        visiting.add(node.node_id)
+
+        position = len(slots)
+        slots.append(None)
+        children: list[str] = []
+        for child_id in node.children:
+            child = state.nodes.get(child_id)
+            if child is None:
+                continue
+            survivor = self._compact_subtree(state, child, slots, aliases, visiting)
+            if survivor is not None:
+                children.append(survivor)
+
+        plain = not node.interactable and node.role is None
+        if plain and not children and not self.keep_text_nodes:
+            return None
+        if plain and len(children) == 1 and node.tag in self.wrapper_tags and not node.text:
+            aliases[node.node_id] = children[0]
+            return children[0]
+
+        slots[position] = DOMNode(
+            node_id=node.node_id,
+            tag=node.tag,
+            text=node.text if node.interactable or self.keep_text_nodes else "",
+            attributes={
+                key: value
+                for key, value in node.attributes.items()
+                if key in self.kept_attributes
+            },
+            visible=True,
+            interactable=node.interactable,
+            role=node.role,
+            children=children,
+        )
+        return node.node_id
+
+    def _rename_metadata_key(self, key: str, renames: dict[str, str]) -> str:
+        if not self.rename_ids:
+            return key
+        prefix, separator, node_id = key.rpartition(":")
+        if separator and node_id in renames:
+            return f"{prefix}:{renames[node_id]}"
+        return key
+
+    def _rename_action_key(self, key: str, renames: dict[str, str]) -> str:
+        if not self.rename_ids:
+            return key
+        parts = key.split(":", 2)
+        if len(parts) == 3 and parts[1] in renames:
+            parts[1] = renames[parts[1]]
+        return ":".join(parts)
@@ -1,63 +1,210 @@
 from __future__ import annotations
 
+import json
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any
+
 from core.models import DOMNode, DOMState
+from core.persistent import NodeMap
 
 
 class DOMEncoder:
-    """Converts raw browser snapshots into canonical DOMState objects."""
+    """Converts raw browser snapshots into canonical DOMState objects.
+
+    Encoded states are already canonical: `NodeMap` keeps nodes in node-id
+    order and metadata is inserted in key order, so no second copy is made.
+    """
 
     def encode(self, snapshot: dict) -> DOMState:
-        url = str(snapshot.get("url", "about:blank"))
-        raw_nodes = snapshot.get("nodes", [])
-        nodes: dict[str, DOMNode] = {}
-
-        for index, raw_node in enumerate(raw_nodes):
-            node_id = str(raw_node.get("id", f"n{index}"))
-            node = DOMNode(
-                node_id=node_id,
-                tag=str(raw_node.get("tag", "div")).lower(),
-                text=str(raw_node.get("text", "")),
-                attributes={
-                    str(key): str(value)
-                    for key, value in dict(raw_node.get("attributes", {})).items()
-                },
-                visible=bool(raw_node.get("visible", True)),
-                interactable=bool(raw_node.get("interactable", False)),
-                role=(
-                    str(raw_node.get("role"))
-                    if raw_node.get("role") is not None
-                    else None
-                ),
-                children=[str(child) for child in raw_node.get("children", [])],
-            )
-            nodes[node_id] = node
-
-        state = DOMState(
-            url=url,
+        return self.encode_iter(snapshot.get("nodes", []), header=snapshot)
+
+    def encode_iter(
+        self,
+        raw_nodes: Iterable[Mapping],
+        header: Mapping | None = None,
+    ) -> DOMState:
+        """Encodes nodes one at a time from any iterable of raw node dicts.
+
+        `header` carries the snapshot's other fields (url, focused_node_id,
+        history, metadata, step); its "nodes" entry, if any, is ignored.
+        """
+        header = header or {}
+        nodes = NodeMap(self._encode_node(index, raw) for index, raw in enumerate(raw_nodes))
+        metadata = dict(header.get("metadata", {}))
+        return DOMState(
+            url=str(header.get("url", "about:blank")),
             nodes=nodes,
             focused_node_id=(
-                str(snapshot["focused_node_id"])
-                if snapshot.get("focused_node_id") is not None
+                str(header["focused_node_id"])
+                if header.get("focused_node_id") is not None
                 else None
             ),
-            interaction_history=[str(item) for item in snapshot.get("history", [])],
-            metadata={
-                str(key): str(value)
-                for key, value in dict(snapshot.get("metadata", {})).items()
-            },
-            step=int(snapshot.get("step", 0)),
+            interaction_history=[str(item) for item in header.get("history", [])],
+            metadata={str(key): str(metadata[key]) for key in sorted(metadata, key=str)},
+            step=int(header.get("step", 0)),
         )
-        return self.canonicalize(state)
 
-    def canonicalize(self, state: DOMState) -> DOMState:
-        canonical_nodes = {
-            node_id: state.nodes[node_id] for node_id in sorted(state.nodes.keys())
+    def encode_jsonl(self, lines: Iterable[str]) -> DOMState:
+        """Encodes a line-delimited snapshot, e.g. straight from a file handle.
+
+        The first non-blank line is the header object and every later line is
+        one raw node, so only one node's JSON is held in memory at a time.
+        """
+        records = (json.loads(line) for line in lines if line.strip())
+        header = next(records, {})
+        return self.encode_iter(records, header=header)
+
+    def encode_delta(self, prev_state: DOMState, mutations: Mapping) -> DOMState:
+        """Applies mutation records to `prev_state` and returns the new state.
+
+        `mutations` may hold "removed" (node ids), "added" (raw nodes, which
+        replace any node with the same id) and "changed" (partial raw nodes:
+        an "id" plus the fields to overwrite), applied in that order. "url",
+        "focused_node_id", "history" and "step" replace the previous values.
+        "metadata" is merged, and a None value deletes its key. Untouched
+        nodes stay shared with `prev_state`, which is left unchanged, so the
+        cost scales with the mutations rather than the page.
+        """
+        state = prev_state.clone()
+        for node_id in mutations.get("removed", []):
+            state.remove_node(str(node_id))
+        for raw_node in mutations.get("added", []):
+            if "id" not in raw_node:
+                raise ValueError("Added nodes need an explicit id")
+            _, node = self._encode_node(0, raw_node)
+            state.set_node(node)
+        for raw_change in mutations.get("changed", []):
+            changes = {
+                name: convert(raw_change[name])
+                for name, convert in _FIELD_CONVERTERS.items()
+                if name in raw_change
+            }
+            state.update_node(str(raw_change["id"]), **changes)
+
+        if "url" in mutations:
+            state.url = str(mutations["url"])
+        if "focused_node_id" in mutations:
+            focused = mutations["focused_node_id"]
+            state.focused_node_id = str(focused) if focused is not None else None
+        if "history" in mutations:
+            state.interaction_history = [str(item) for item in mutations["history"]]
+        if "step" in mutations:
+            state.step = int(mutations["step"])
+        if mutations.get("metadata"):
+            metadata = dict(state.metadata)
+            for key, value in mutations["metadata"].items():
+                if value is None:
+                    metadata.pop(str(key), None)
+                else:
+                    metadata[str(key)] = str(value)
+            state.metadata = {key: metadata[key] for key in sorted(metadata)}
+        return state
+
+    def decode(self, state: DOMState) -> dict:
+        """Inverse of `encode`: a JSON-serializable snapshot of `state`."""
+        return {
+            "url": state.url,
+            "focused_node_id": state.focused_node_id,
+            "history": list(state.interaction_history),
+            "metadata": dict(state.metadata),
+            "step": state.step,
+            "nodes": [_raw_node(node) for node in state.nodes.values()],
         }
+
+    def diff(self, prev_state: DOMState, next_state: DOMState) -> dict:
+        """Mutation records that `encode_delta` turns `prev_state` into `next_state` with.
+
+        Changed nodes are recorded as full "added" records. Nodes shared
+        between the two states are skipped by identity before comparing.
+        """
+        mutations: dict[str, object] = {}
+        removed = [node_id for node_id in prev_state.nodes if node_id not in next_state.nodes]
+        added = []
+        for node_id, node in next_state.nodes.items():
+            previous = prev_state.nodes.get(node_id)
+            if previous is not node and previous != node:
+                added.append(_raw_node(node))
+        if removed:
+            mutations["removed"] = removed
+        if added:
+            mutations["added"] = added
+
+        metadata: dict[str, str | None] = {
+            key: None for key in prev_state.metadata if key not in next_state.metadata
+        }
+        for key, value in next_state.metadata.items():
+            if prev_state.metadata.get(key) != value:
+                metadata[key] = value
+        if metadata:
+            mutations["metadata"] = metadata
+        if next_state.url != prev_state.url:
+            mutations["url"] = next_state.url
+        if next_state.focused_node_id != prev_state.focused_node_id:
+            mutations["focused_node_id"] = next_state.focused_node_id
+        if next_state.interaction_history != prev_state.interaction_history:
+            mutations["history"] = list(next_state.interaction_history)
+        if next_state.step != prev_state.step:
+            mutations["step"] = next_state.step
+        return mutations
+
+    def canonicalize(self, state: DOMState) -> DOMState:
         return DOMState(
             url=state.url,
-            nodes=canonical_nodes,
+            nodes=state.nodes.copy(),
             focused_node_id=state.focused_node_id,
             interaction_history=list(state.interaction_history),
             metadata={key: state.metadata[key] for key in sorted(state.metadata.keys())},
             step=state.step,
         )
+
+    def _encode_node(self, index: int, raw_node: Mapping) -> tuple[str, DOMNode]:
+        node_id = str(raw_node.get("id", f"n{index}"))
+        node = DOMNode(
+            node_id=node_id,
+            tag=str(raw_node.get("tag", "div")).lower(),
+            text=str(raw_node.get("text", "")),
+            attributes={
+                str(key): str(value)
+                for key, value in dict(raw_node.get("attributes", {})).items()
+            },
+            visible=bool(raw_node.get("visible", True)),
+            interactable=bool(raw_node.get("interactable", False)),
+            role=(
+                str(raw_node.get("role"))
+                if raw_node.get("role") is not None
+                else None
+            ),
+            children=[str(child) for child in raw_node.get("children", [])],
+        )
+        return node_id, node
+
+
+_FIELD_CONVERTERS: dict[str, Callable[[Any], object]] = {
+    "tag": lambda value: str(value).lower(),
+    "text": str,
+    "attributes": lambda value: {str(key): str(item) for key, item in dict(value).items()},
+    "visible": bool,
+    "interactable": bool,
+    "role": lambda value: str(value) if value is not None else None,
+    "children": lambda value: [str(child) for child in value],
+}
+
+
+def _raw_node(node: DOMNode) -> dict:
+    return {
+        "id": node.node_id,
+        "tag": node.tag,
+        "text": node.text,
+        "attributes": dict(node.attributes),
+        "visible": node.visible,
+        "interactable": node.interactable,
+        "role": node.role,
+        "children": list(node.children),
+    }
+
+
+def iter_jsonl_snapshot(snapshot: Mapping) -> Iterator[str]:
+    """Serializes a snapshot dict in the line-delimited form `encode_jsonl` reads."""
+    yield json.dumps({key: value for key, value in snapshot.items() if key != "nodes"}) + "\n"
+    for raw_node in snapshot.get("nodes", []):
+        yield json.dumps(raw_node) + "\n"
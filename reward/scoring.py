@@ -7,6 +7,8 @@ from core.models import DOMState, RewardBreakdown
 class RewardModel:
     """Heuristic reward model for baseline planning and simulation."""
 
+    SUBMIT_NODE_ID = "n_submit"
+
     def evaluate(
         self,
         prev_state: DOMState,
@@ -47,7 +49,7 @@ class RewardModel:
 
         if action.action_type == "click":
             reward += 0.05
-            if action.node_id == "n_submit" and next_state.metadata.get("all_required_filled") == "true":
+            if action.node_id == self.SUBMIT_NODE_ID and next_state.metadata.get("all_required_filled") == "true":
                 reward += 0.95
 
         if action.action_type == "select":
@@ -1,6 +1,13 @@
 """Execution loop and environment bindings for DOM-MCTS."""
 
 from .agent import AgentRunner, EpisodeResult
-from .environment import MockBrowserEnv
+from .async_agent import AsyncAgentRunner
+from .environment import AsyncEnvAdapter, MockBrowserEnv
 
-__all__ = ["AgentRunner", "EpisodeResult", "MockBrowserEnv"]
+__all__ = [
+    "AgentRunner",
+    "AsyncAgentRunner",
+    "AsyncEnvAdapter",
+    "EpisodeResult",
+    "MockBrowserEnv",
+]
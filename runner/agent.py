@@ -31,6 +31,9 @@ class AgentRunner:
     def run_episode(self, env: object, max_iterations: int = 10) -> EpisodeResult:
         executed_actions: list[Action] = []
         final_plan: PlanResult | None = None
+        self.planner.reset()
+        if self.trace_recorder:
+            self.trace_recorder.start_episode()
 
         for _ in range(max_iterations):
             if env.is_terminal():
@@ -42,17 +45,27 @@ class AgentRunner:
                 break
 
             if self.trace_recorder:
-                self.trace_recorder.record_plan(plan_result.actions)
+                self.trace_recorder.record_plan(plan_result.actions, plan_result.root)
 
+            executed_now: list[Action] = []
             for action in plan_result.actions[: self.execute_prefix]:
                 prev_state = env.observe()
                 next_state = env.apply(action)
-                executed_actions.append(action)
+                executed_now.append(action)
                 if self.trace_recorder:
-                    self.trace_recorder.record_action(prev_state, action, next_state)
+                    self.trace_recorder.record_action(
+                        prev_state,
+                        action,
+                        next_state,
+                        terminal=env.is_terminal(),
+                        success=env.is_success(),
+                    )
                 if env.is_terminal():
                     break
 
+            executed_actions.extend(executed_now)
+            self.planner.advance(executed_now)
+
         return EpisodeResult(
             success=env.is_success(),
             steps=len(executed_actions),
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from action_space.actions import Action
+from runner.agent import EpisodeResult
+from search.async_mcts import AsyncMCTSPlanner
+from search.mcts import PlanResult
+from traces.recorder import TraceRecorder
+
+
+class AsyncAgentRunner:
+    """Async counterpart of AgentRunner for envs implementing AsyncBrowserEnv."""
+
+    def __init__(
+        self,
+        planner: AsyncMCTSPlanner,
+        execute_prefix: int = 1,
+        trace_recorder: TraceRecorder | None = None,
+    ) -> None:
+        self.planner = planner
+        self.execute_prefix = max(1, execute_prefix)
+        self.trace_recorder = trace_recorder
+
+    async def run_episode(self, env: object, max_iterations: int = 10) -> EpisodeResult:
+        executed_actions: list[Action] = []
+        final_plan: PlanResult | None = None
+        self.planner.reset()
+        if self.trace_recorder:
+            self.trace_recorder.start_episode()
+
+        for _ in range(max_iterations):
+            if await env.is_terminal():
+                break
+
+            plan_result = await self.planner.plan(env)
+            final_plan = plan_result
+            if not plan_result.actions:
+                break
+
+            if self.trace_recorder:
+                self.trace_recorder.record_plan(plan_result.actions, plan_result.root)
+
+            executed_now: list[Action] = []
+            for action in plan_result.actions[: self.execute_prefix]:
+                prev_state = await env.observe()
+                next_state = await env.apply(action)
+                executed_now.append(action)
+                if self.trace_recorder:
+                    self.trace_recorder.record_action(
+                        prev_state,
+                        action,
+                        next_state,
+                        terminal=await env.is_terminal(),
+                        success=await env.is_success(),
+                    )
+                if await env.is_terminal():
+                    break
+
+            executed_actions.extend(executed_now)
+            self.planner.advance(executed_now)
+
+        return EpisodeResult(
+            success=await env.is_success(),
+            steps=len(executed_actions),
+            executed_actions=executed_actions,
+            final_plan=final_plan,
+        )
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import copy
 
 from action_space.actions import Action
@@ -18,10 +19,28 @@ class MockBrowserEnv:
         self._submitted = False
         self._field_values: dict[str, str] = {"n_name": "", "n_email": ""}
         self._history: list[str] = []
+        self._undo_log: list[tuple[int, bool, bool, bool, str | None, str]] = []
 
     def clone(self) -> "MockBrowserEnv":
         return copy.deepcopy(self)
 
+    def snapshot(self) -> int:
+        return len(self._undo_log)
+
+    def restore(self, token: int) -> None:
+        if not 0 <= token <= len(self._undo_log):
+            raise ValueError(f"Unknown snapshot token: {token!r}")
+
+        while len(self._undo_log) > token:
+            step, success, failed, submitted, field_id, field_value = self._undo_log.pop()
+            self._step = step
+            self._success = success
+            self._failed = failed
+            self._submitted = submitted
+            self._history.pop()
+            if field_id is not None:
+                self._field_values[field_id] = field_value
+
     def observe(self) -> DOMState:
         required_filled = all(bool(value.strip()) for value in self._field_values.values())
         status_text = "success" if self._success else "pending"
@@ -105,6 +124,17 @@ class MockBrowserEnv:
         if self.is_terminal():
             return self.observe()
 
+        field_id = action.node_id if action.node_id in self._field_values else None
+        self._undo_log.append(
+            (
+                self._step,
+                self._success,
+                self._failed,
+                self._submitted,
+                field_id,
+                self._field_values[field_id] if field_id is not None else "",
+            )
+        )
         self._step += 1
         self._history.append(action.canonical())
 
@@ -131,3 +161,32 @@ class MockBrowserEnv:
 
     def is_success(self) -> bool:
         return self._success
+
+
+class AsyncEnvAdapter:
+    """Exposes a synchronous env through the AsyncBrowserEnv interface.
+
+    `latency` adds an `asyncio.sleep` to every `apply`, which is handy for
+    exercising concurrent planning without a real browser.
+    """
+
+    def __init__(self, env: MockBrowserEnv, latency: float = 0.0) -> None:
+        self.env = env
+        self.latency = latency
+
+    async def observe(self) -> DOMState:
+        return self.env.observe()
+
+    async def apply(self, action: Action) -> DOMState:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.env.apply(action)
+
+    async def clone(self) -> "AsyncEnvAdapter":
+        return AsyncEnvAdapter(self.env.clone(), latency=self.latency)
+
+    async def is_terminal(self) -> bool:
+        return self.env.is_terminal()
+
+    async def is_success(self) -> bool:
+        return self.env.is_success()
@@ -1,6 +1,28 @@
 """MCTS planning core for DOM-grounded action search."""
 
+from .async_mcts import AsyncMCTSPlanner
+from .evaluation import (
+    HeuristicEvaluator,
+    Leaf,
+    LeafEvaluator,
+    LinearValueModel,
+    RolloutEvaluator,
+)
 from .mcts import MCTSConfig, MCTSPlanner, PlanResult, TreeNode
 from .policy import PriorPolicy
+from .tree_store import ArrayTree
 
-__all__ = ["MCTSConfig", "MCTSPlanner", "PlanResult", "PriorPolicy", "TreeNode"]
+__all__ = [
+    "ArrayTree",
+    "AsyncMCTSPlanner",
+    "HeuristicEvaluator",
+    "Leaf",
+    "LeafEvaluator",
+    "LinearValueModel",
+    "MCTSConfig",
+    "MCTSPlanner",
+    "PlanResult",
+    "PriorPolicy",
+    "RolloutEvaluator",
+    "TreeNode",
+]
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import nullcontext
+from typing import Any
+
+from action_space.actions import Action, ActionGenerator
+from core.models import DOMState
+from reward.scoring import RewardModel
+from search.evaluation import Leaf, LeafEvaluator
+from search.mcts import (
+    MCTSConfig,
+    MCTSPlanner,
+    PlanResult,
+    TreeNode,
+    _child_visits,
+    _reject_unsupported,
+)
+from search.policy import PriorPolicy
+
+
+class AsyncMCTSPlanner(MCTSPlanner):
+    """PUCT planner that awaits an async env and keeps many simulations in flight.
+
+    Up to `MCTSConfig.concurrency` simulations run at once on one shared tree.
+    Virtual loss spreads them across siblings the same way as in
+    tree-parallel mode. Tree updates never span an `await`, so no lock is
+    needed. Options only the synchronous planner implements raise
+    ValueError.
+    """
+
+    def __init__(
+        self,
+        action_generator: ActionGenerator,
+        reward_model: RewardModel,
+        prior_policy: PriorPolicy,
+        config: MCTSConfig | None = None,
+        leaf_evaluator: LeafEvaluator | None = None,
+    ) -> None:
+        config = config or MCTSConfig()
+        _reject_unsupported(
+            type(self).__name__,
+            {
+                "root_selection='gumbel'": config.root_selection == "gumbel",
+                "workers > 1": config.workers > 1,
+                "threads > 1": config.threads > 1,
+                "tree_store='arrays'": config.tree_store == "arrays",
+                "transition_cache_size": config.transition_cache_size > 0,
+                "leaf_batch_size > 1": config.leaf_batch_size > 1,
+            },
+        )
+        super().__init__(
+            action_generator=action_generator,
+            reward_model=reward_model,
+            prior_policy=prior_policy,
+            config=config,
+            leaf_evaluator=leaf_evaluator,
+        )
+        self._virtual_loss_active = True
+        self._tree_lock = nullcontext()
+
+    async def plan(  # type: ignore[override]
+        self,
+        env: Any,
+        deadline: float | None = None,
+    ) -> PlanResult:
+        deadline = self._resolve_deadline(deadline)
+        root_state = await env.observe()
+        root = self._reusable_root(root_state)
+        stop = self._stop_condition(max(0, self.config.simulations - root.visits), deadline)
+        started = 0
+
+        async def simulate_on_clones() -> None:
+            nonlocal started
+            while not stop.should_stop(started, _child_visits(root)):
+                started += 1
+                sim_env = await env.clone()
+                await self._simulate_async(root, sim_env)
+
+        lanes = max(1, self.config.concurrency)
+        await asyncio.gather(*(simulate_on_clones() for _ in range(lanes)))
+        return self._finish_plan(root, started, stop)
+
+    async def _simulate_async(self, root: TreeNode, sim_env: Any) -> None:
+        path = [root]
+        expanding: list[tuple[TreeNode, str]] = []
+        edges: list[tuple[str, float]] = []
+        value: float | None = None
+        self._add_virtual_loss(root)
+
+        try:
+            value = await self._descend_async(sim_env, path, expanding, edges)
+        finally:
+            for node, key in expanding:
+                node.expanding.discard(key)
+            for node in path:
+                node.virtual_visits -= 1
+            if value is not None:
+                self._backpropagate(path, edges, value)
+                self._enforce_memory_budget(path[0])
+
+    async def _descend_async(
+        self,
+        sim_env: Any,
+        path: list[TreeNode],
+        expanding: list[tuple[TreeNode, str]],
+        edges: list[tuple[str, float]],
+    ) -> float:
+        """Walks to a leaf, appending each edge's key and discounted reward to `edges`.
+
+        Returns the leaf's value estimate.
+        """
+        node = path[-1]
+        depth = 0
+        discount = 1.0
+        leaf_state = node.state
+        terminal: bool | None = None
+
+        while True:
+            terminal = await sim_env.is_terminal()
+            if terminal or depth >= self.config.rollout_depth:
+                break
+
+            if node.state is None:
+                self._materialize_state(node, await sim_env.observe())
+            edge = self._next_edge(node, path)
+            if edge is None:
+                break
+            action, child, prior = edge
+            if child is None:
+                expanding.append((node, action.canonical()))
+            else:
+                self._add_virtual_loss(child)
+
+            prev_state = await sim_env.observe()
+            next_state = await sim_env.apply(action)
+            reward = await self._reward_for_transition_async(
+                prev_state=prev_state,
+                action=action,
+                next_state=next_state,
+                sim_env=sim_env,
+                discount=discount,
+            )
+            edges.append((action.canonical(), reward))
+            discount *= self.config.discount
+            depth += 1
+            leaf_state = next_state
+            terminal = None
+
+            if child is None:
+                child = self._attach_child(node, action, prior, next_state, path)
+                self._add_virtual_loss(child)
+                path.append(child)
+                break
+
+            node = child
+            path.append(node)
+
+        if self.leaf_evaluator.steps_env:
+            return await self._rollout_async(sim_env, depth, discount)
+        leaf = Leaf(
+            state=leaf_state if leaf_state is not None else await sim_env.observe(),
+            env=sim_env,
+            depth=depth,
+            discount=discount,
+            discount_factor=self.config.discount,
+            remaining=self.config.rollout_depth - depth,
+            terminal=await sim_env.is_terminal() if terminal is None else terminal,
+        )
+        return self.leaf_evaluator.evaluate_batch([leaf])[0]
+
+    async def _reward_for_transition_async(
+        self,
+        prev_state: DOMState,
+        action: Action,
+        next_state: DOMState,
+        sim_env: Any,
+        discount: float,
+    ) -> float:
+        breakdown = self.reward_model.evaluate(
+            prev_state=prev_state,
+            action=action,
+            next_state=next_state,
+            is_terminal=await sim_env.is_terminal(),
+            is_success=await sim_env.is_success(),
+        )
+        return discount * breakdown.total
+
+    async def _rollout_async(self, sim_env: Any, depth: int, discount: float) -> float:
+        total = 0.0
+        current_depth = depth
+
+        while not await sim_env.is_terminal() and current_depth < self.config.rollout_depth:
+            state = await sim_env.observe()
+            candidates = self._ranked_candidates(state, 1)
+            if not candidates:
+                break
+
+            action = candidates[0][0]
+            next_state = await sim_env.apply(action)
+            total += await self._reward_for_transition_async(
+                prev_state=state,
+                action=action,
+                next_state=next_state,
+                sim_env=sim_env,
+                discount=discount,
+            )
+            discount *= self.config.discount
+            current_depth += 1
+
+        return total
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Any, Generic, TypeVar
+
+from action_space.actions import Action
+from core.models import DOMState, RewardBreakdown
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[V]):
+    """Bounded least-recently-used cache with hit/miss counters.
+
+    A `maxsize` of 0 disables the cache. Operations take an internal lock so
+    tree-parallel planning can share one instance.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = max(0, maxsize)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> V | None:
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value  # type: ignore[return-value]
+
+    def put(self, key: Hashable, value: V) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass
+class Transition:
+    """Outcome of one (state, action) step, as cached for search."""
+
+    next_state: DOMState
+    terminal: bool
+    success: bool
+    reward: RewardBreakdown | None = None
+
+
+class MemoizedEnv:
+    """Env view that answers known transitions from a cache.
+
+    An `apply` whose (state fingerprint, action) pair is cached does not touch
+    the wrapped env. The action is queued instead, and queued actions are
+    replayed into the env only when an uncached action has to run for real.
+    This is only sound for envs whose transitions depend on nothing but the
+    observed state. `last` is the transition the latest `apply` took, so
+    callers can memoize work on it.
+    """
+
+    def __init__(self, env: Any, cache: LRUCache[Transition]) -> None:
+        self.env = env
+        self.cache = cache
+        self.replayed = 0
+        self.last: Transition | None = None
+        self._pending: list[Action] = []
+        self._state: DOMState | None = None
+        self._terminal: bool | None = None
+        self._success: bool | None = None
+
+    def observe(self) -> DOMState:
+        if self._state is None:
+            self._state = self.env.observe()
+        return self._state
+
+    def is_terminal(self) -> bool:
+        if self._terminal is None:
+            self._terminal = self.env.is_terminal()
+        return self._terminal
+
+    def is_success(self) -> bool:
+        if self._success is None:
+            self._success = self.env.is_success()
+        return self._success
+
+    def apply(self, action: Action) -> DOMState:
+        key = (self.observe().fingerprint(), action.canonical())
+        transition = self.cache.get(key)
+        if transition is not None:
+            self._pending.append(action)
+        else:
+            self._replay()
+            next_state = self.env.apply(action)
+            transition = Transition(
+                next_state=next_state,
+                terminal=self.env.is_terminal(),
+                success=self.env.is_success(),
+            )
+            self.cache.put(key, transition)
+        self.last = transition
+        self._state = transition.next_state
+        self._terminal = transition.terminal
+        self._success = transition.success
+        return transition.next_state
+
+    def clone(self) -> MemoizedEnv:
+        self._replay()
+        return MemoizedEnv(self.env.clone(), self.cache)
+
+    def _replay(self) -> None:
+        for action in self._pending:
+            self.env.apply(action)
+        self.replayed += len(self._pending)
+        self._pending.clear()
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Protocol, runtime_checkable
+
+from action_space.actions import Action
+from core.models import DOMState
+from reward.scoring import RewardModel
+
+if TYPE_CHECKING:
+    from search.mcts import MCTSPlanner
+
+
+@dataclass
+class Leaf:
+    """A search leaf awaiting a value estimate.
+
+    `discount` is the discount already accumulated on the way down,
+    `discount_factor` is the planner's per-step discount, and `remaining` is
+    how many steps are left before `rollout_depth`. `env` sits
+    at `state` only while the leaf is evaluated straight after its descent;
+    batched leaves are evaluated after the env has been rewound.
+    """
+
+    state: DOMState
+    env: Any
+    depth: int
+    discount: float
+    discount_factor: float
+    remaining: int
+    terminal: bool
+
+
+@runtime_checkable
+class LeafEvaluator(Protocol):
+    """Estimates the discounted return still to come from each leaf.
+
+    Evaluators with `steps_env = False` read only `Leaf.state`, so the
+    planner may queue their leaves and evaluate them in batches.
+    """
+
+    steps_env: bool
+
+    def evaluate_batch(self, leaves: list[Leaf]) -> list[float]: ...
+
+
+class RolloutEvaluator:
+    """Plays the planner's greedy top candidate forward in the leaf's env."""
+
+    steps_env = True
+
+    def __init__(self, planner: MCTSPlanner) -> None:
+        self.planner = planner
+
+    def evaluate_batch(self, leaves: list[Leaf]) -> list[float]:
+        return [self.planner._rollout(leaf.env, leaf.depth, leaf.discount) for leaf in leaves]
+
+
+def required_fields(state: DOMState) -> tuple[int, int]:
+    """(required, filled) counts over visible interactable nodes marked required."""
+    required = filled = 0
+    for node in state.required_nodes():
+        if not (node.visible and node.interactable):
+            continue
+        required += 1
+        if node.text.strip() or state.metadata.get(f"filled:{node.node_id}") == "true":
+            filled += 1
+    return required, filled
+
+
+class HeuristicEvaluator:
+    """Values a leaf as filling its remaining required fields, then submitting.
+
+    `fill_value` and `submit_value` are what `reward_model` pays for a
+    successful fill and for the final, successful submit. Steps are
+    discounted by the planner's `Leaf.discount_factor`, and the plan is cut
+    off at the leaf's remaining depth.
+    """
+
+    steps_env = False
+
+    def __init__(self, reward_model: RewardModel | None = None) -> None:
+        self.fill_value, self.submit_value = _step_values(reward_model or RewardModel())
+
+    def evaluate_batch(self, leaves: list[Leaf]) -> list[float]:
+        return [self.evaluate(leaf) for leaf in leaves]
+
+    def evaluate(self, leaf: Leaf) -> float:
+        if leaf.terminal:
+            return 0.0
+        required, filled = required_fields(leaf.state)
+        value = 0.0
+        step_discount = 1.0
+        for step in range(leaf.remaining):
+            if step < required - filled:
+                value += step_discount * self.fill_value
+            else:
+                value += step_discount * self.submit_value
+                break
+            step_discount *= leaf.discount_factor
+        return leaf.discount * value
+
+
+def _step_values(reward_model: RewardModel) -> tuple[float, float]:
+    """Rewards for filling one required field and for a successful submit."""
+    empty = DOMState(url="", nodes={})
+    filled = DOMState(url="", nodes={}, metadata={"filled:field": "true"})
+    submitted = DOMState(
+        url="",
+        nodes={},
+        metadata={"all_required_filled": "true", "submitted": "true", "success": "true"},
+    )
+    fill = reward_model.evaluate(
+        prev_state=empty,
+        action=Action("type", "field", "text"),
+        next_state=filled,
+        is_terminal=False,
+        is_success=False,
+    )
+    submit = reward_model.evaluate(
+        prev_state=empty,
+        action=Action("click", reward_model.SUBMIT_NODE_ID),
+        next_state=submitted,
+        is_terminal=True,
+        is_success=True,
+    )
+    return fill.total, submit.total
+
+
+class LinearValueModel:
+    """Linear state-value model over `FEATURES`, fit by ridge regression.
+
+    `fit` solves the normal equations directly; with this few features that
+    needs no numerical library.
+    """
+
+    steps_env = False
+    FEATURES = (
+        "bias",
+        "required_unfilled",
+        "required_filled",
+        "all_required_filled",
+        "submitted",
+        "success",
+    )
+
+    def __init__(self, weights: tuple[float, ...] | None = None) -> None:
+        if weights is None:
+            weights = (0.0,) * len(self.FEATURES)
+        if len(weights) != len(self.FEATURES):
+            raise ValueError(f"Expected {len(self.FEATURES)} weights, got {len(weights)}")
+        self.weights = tuple(weights)
+
+    @classmethod
+    def features(cls, state: DOMState) -> tuple[float, ...]:
+        required, filled = required_fields(state)
+        return (
+            1.0,
+            float(required - filled),
+            float(filled),
+            float(state.metadata.get("all_required_filled") == "true"),
+            float(state.metadata.get("submitted") == "true"),
+            float(state.metadata.get("success") == "true"),
+        )
+
+    def predict(self, state: DOMState) -> float:
+        return sum(weight * value for weight, value in zip(self.weights, self.features(state)))
+
+    def evaluate_batch(self, leaves: list[Leaf]) -> list[float]:
+        matrix = [self.features(leaf.state) for leaf in leaves]
+        return [
+            0.0
+            if leaf.terminal
+            else leaf.discount * sum(weight * value for weight, value in zip(self.weights, row))
+            for leaf, row in zip(leaves, matrix)
+        ]
+
+    @classmethod
+    def fit(
+        cls,
+        states: list[DOMState],
+        returns: list[float],
+        ridge: float = 1e-3,
+    ) -> LinearValueModel:
+        if len(states) != len(returns):
+            raise ValueError("states and returns must have the same length")
+        size = len(cls.FEATURES)
+        gram = [[ridge if row == col else 0.0 for col in range(size)] for row in range(size)]
+        moment = [0.0] * size
+        for state, target in zip(states, returns):
+            row = cls.features(state)
+            for i in range(size):
+                moment[i] += row[i] * target
+                for j in range(size):
+                    gram[i][j] += row[i] * row[j]
+        return cls(tuple(_solve(gram, moment)))
+
+    @classmethod
+    def from_transitions(
+        cls,
+        transitions: Iterable[tuple[DOMState, Action, DOMState]],
+        reward_model: RewardModel,
+        discount: float = 0.96,
+        ridge: float = 1e-3,
+    ) -> LinearValueModel:
+        """Fits discounted returns-to-go from recorded (prev, action, next) steps.
+
+        A transition whose `prev` state does not continue the previous one
+        starts a new episode; an episode ends terminally on a success state.
+        """
+        states: list[DOMState] = []
+        returns: list[float] = []
+        for episode in _split_episodes(transitions):
+            rewards = []
+            for index, (prev_state, action, next_state) in enumerate(episode):
+                success = next_state.metadata.get("success") == "true"
+                breakdown = reward_model.evaluate(
+                    prev_state=prev_state,
+                    action=action,
+                    next_state=next_state,
+                    is_terminal=success or index == len(episode) - 1,
+                    is_success=success,
+                )
+                rewards.append(breakdown.total)
+            to_go = 0.0
+            for (prev_state, _, _), reward in zip(reversed(episode), reversed(rewards)):
+                to_go = reward + discount * to_go
+                states.append(prev_state)
+                returns.append(to_go)
+        return cls.fit(states, returns, ridge=ridge)
+
+
+def _split_episodes(
+    transitions: Iterable[tuple[DOMState, Action, DOMState]],
+) -> list[list[tuple[DOMState, Action, DOMState]]]:
+    episodes: list[list[tuple[DOMState, Action, DOMState]]] = []
+    last_fingerprint: int | None = None
+    for transition in transitions:
+        prev_state, _, next_state = transition
+        if not episodes or prev_state.fingerprint() != last_fingerprint:
+            episodes.append([])
+        episodes[-1].append(transition)
+        last_fingerprint = next_state.fingerprint()
+    return episodes
+
+
+def _solve(matrix: list[list[float]], vector: list[float]) -> list[float]:
+    """Gaussian elimination with partial pivoting for a small dense system."""
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda row: abs(rows[row][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if rows[col][col] == 0.0:
+            continue
+        for row in range(col + 1, size):
+            factor = rows[row][col] / rows[col][col]
+            for k in range(col, size + 1):
+                rows[row][k] -= factor * rows[col][k]
+    solution = [0.0] * size
+    for row in reversed(range(size)):
+        if rows[row][row] == 0.0:
+            continue
+        tail = sum(rows[row][k] * solution[k] for k in range(row + 1, size))
+        solution[row] = (rows[row][size] - tail) / rows[row][row]
+    return solution
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
 import math
-from dataclasses import dataclass, field
-from typing import Any
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field, replace
+from typing import Any, Literal
 
 from action_space.actions import Action, ActionGenerator
+from core.interfaces import SnapshotEnv
 from core.models import DOMState
 from reward.scoring import RewardModel
-from search.policy import PriorPolicy
+from search.cache import LRUCache, MemoizedEnv, Transition
+from search.evaluation import Leaf, LeafEvaluator, RolloutEvaluator
+from search.policy import PriorPolicy, RankedActions
+from search.stopping import StopCondition, StopReason
+from search.tree_store import ArrayTree
 
 
 @dataclass
@@ -16,18 +26,73 @@ class MCTSConfig:
     exploration_constant: float = 1.4
     rollout_depth: int = 5
     top_k_actions: int = 12
+    expansion: Literal["top_k", "progressive"] = "top_k"
+    widening_constant: float = 1.0
+    widening_exponent: float = 0.5
+    root_selection: Literal["puct", "gumbel"] = "puct"
+    gumbel_actions: int = 8
+    gumbel_scale: float = 1.0
+    leaf_batch_size: int = 1
+    # A transition cache requires deterministic_transitions.
+    transition_cache_size: int = 0
+    deterministic_transitions: bool = False
     discount: float = 0.96
+    reuse_tree: bool = True
+    transpositions: bool = False
+    use_snapshots: bool = True
+    workers: int = 1
+    threads: int = 1
+    concurrency: int = 8
+    candidate_cache_size: int = 1024
+    tree_store: Literal["nodes", "arrays"] = "nodes"
+    max_nodes: int | None = None
+    max_bytes: int | None = None
+    time_budget: float | None = None
+    min_simulations: int = 0
+    early_stopping: bool = False
+    convergence_window: int = 16
+    convergence_tolerance: float = 0.02
+    virtual_loss: float = 1.0
+    seed: int | None = None
 
 
-@dataclass
+# Scaling of normalized Q against Gumbel noise and log-priors at the root:
+# sigma(q) = (_GUMBEL_C_VISIT + max child visits) * _GUMBEL_C_SCALE * q.
+_GUMBEL_C_VISIT = 50.0
+_GUMBEL_C_SCALE = 0.1
+
+# Rough per-object sizes used to estimate tree memory against max_bytes.
+_TREE_NODE_BYTES = 600
+_STATE_BYTES = 400
+_DOM_NODE_BYTES = 200
+# Eviction trims the tree to this fraction of the budget so it runs rarely.
+_EVICTION_LOW_WATER = 0.8
+
+
+@dataclass(eq=False)
 class TreeNode:
-    state: DOMState
+    """A search state; with transpositions, several parents may share it.
+
+    `visits` and `value_sum` measure the return from this node's own state.
+    Everything about an edge lives on its parent under the action key: the
+    prior it was ranked with, how often it was taken and the sum of its
+    undiscounted rewards.
+    """
+
+    # None once evicted from an interior node; rebuilt from the env on the next visit.
+    state: DOMState | None
     parent: TreeNode | None = None
     action_from_parent: Action | None = None
-    prior: float = 1.0
     visits: int = 0
     value_sum: float = 0.0
     children: dict[str, TreeNode] = field(default_factory=dict)
+    child_actions: dict[str, Action] = field(default_factory=dict)
+    child_priors: dict[str, float] = field(default_factory=dict)
+    child_visits: dict[str, int] = field(default_factory=dict)
+    child_rewards: dict[str, float] = field(default_factory=dict)
+    virtual_visits: int = 0
+    expanding: set[str] = field(default_factory=set)
+    state_fingerprint: int | None = None
 
     @property
     def q_value(self) -> float:
@@ -35,6 +100,13 @@ class TreeNode:
             return 0.0
         return self.value_sum / self.visits
 
+    def edge_q(self, key: str, discount: float) -> float:
+        """Mean return of taking `key` from this node: reward plus discounted child value."""
+        visits = self.child_visits.get(key, 0)
+        if not visits:
+            return 0.0
+        return self.child_rewards[key] / visits + discount * self.children[key].q_value
+
 
 @dataclass
 class PlanResult:
@@ -42,6 +114,10 @@ class PlanResult:
     estimated_value: float
     simulations_run: int
     root: TreeNode
+    # Set when planning with tree_store="arrays"; `root` then only summarizes
+    # the root and its visited children.
+    tree: ArrayTree | None = None
+    stop_reason: StopReason = "budget"
 
 
 class MCTSPlanner:
@@ -53,114 +129,848 @@ class MCTSPlanner:
         reward_model: RewardModel,
         prior_policy: PriorPolicy,
         config: MCTSConfig | None = None,
+        leaf_evaluator: LeafEvaluator | None = None,
     ) -> None:
         self.action_generator = action_generator
         self.reward_model = reward_model
         self.prior_policy = prior_policy
         self.config = config or MCTSConfig()
+        self.leaf_evaluator = leaf_evaluator or RolloutEvaluator(self)
+        self._root: TreeNode | None = None
+        self._transpositions: dict[int, TreeNode] = {}
+        self._rng = random.Random(self.config.seed) if self.config.seed is not None else None
+        self._gumbel_rng = random.Random()
+        self._executor: ProcessPoolExecutor | None = None
+        self.candidate_cache: LRUCache[RankedActions] = LRUCache(
+            self.config.candidate_cache_size
+        )
+        self.transition_cache: LRUCache[Transition] = LRUCache(
+            self.config.transition_cache_size
+        )
+        self._virtual_loss_active = self.config.threads > 1 or self._batches_leaves()
+        self._tree_lock: Any = threading.Lock() if self._virtual_loss_active else nullcontext()
+        self._env_lock = threading.Lock()
+        self._tree_nodes = 0
+        self._tree_bytes = 0
+        if self.config.transition_cache_size > 0 and not self.config.deterministic_transitions:
+            # Replaying a cached transition is only sound when the env always
+            # makes the same one.
+            raise ValueError("transition_cache_size requires deterministic_transitions")
+        if self.config.tree_store == "arrays":
+            # Every plan starts a fresh ArrayTree, so reuse_tree does not apply.
+            _reject_unsupported(
+                "tree_store='arrays'",
+                {
+                    "transpositions": self.config.transpositions,
+                    "workers > 1": self.config.workers > 1,
+                    "threads > 1": self.config.threads > 1,
+                    "root_selection='gumbel'": self.config.root_selection == "gumbel",
+                    "expansion='progressive'": self.config.expansion == "progressive",
+                    "leaf_batch_size > 1": self.config.leaf_batch_size > 1,
+                    "max_nodes": self.config.max_nodes is not None,
+                    "max_bytes": self.config.max_bytes is not None,
+                },
+            )
+        if self.config.threads > 1:
+            # Worker processes search sequentially; tree-parallel simulations
+            # evaluate each leaf as soon as it is reached.
+            _reject_unsupported(
+                "threads > 1",
+                {
+                    "workers > 1": self.config.workers > 1,
+                    "leaf_batch_size > 1": self._batches_leaves(),
+                },
+            )
+        if self.config.root_selection == "gumbel":
+            # Sequential halving drives the root itself, one simulation at a time.
+            _reject_unsupported(
+                "root_selection='gumbel'",
+                {
+                    "workers > 1": self.config.workers > 1,
+                    "threads > 1": self.config.threads > 1,
+                    "leaf_batch_size > 1": self._batches_leaves(),
+                },
+            )
+
+    def plan(self, env: Any, deadline: float | None = None) -> PlanResult:
+        """Searches from the env's current state.
+
+        `deadline` is a `time.monotonic()` timestamp; when omitted,
+        `MCTSConfig.time_budget` (if set) is measured from this call.
+        """
+        deadline = self._resolve_deadline(deadline)
+        if self.config.tree_store == "arrays":
+            return self._plan_with_array_tree(env, deadline)
 
-    def plan(self, env: Any) -> PlanResult:
         root_state = env.observe()
-        root = TreeNode(state=root_state)
+        root = self._reusable_root(root_state)
+        stop = self._stop_condition(max(0, self.config.simulations - root.visits), deadline)
 
-        for _ in range(self.config.simulations):
-            sim_env = env.clone()
-            node = root
-            path = [root]
-            depth = 0
-            accumulated_value = 0.0
-            discount = 1.0
+        first_action = None
+        if self.config.root_selection == "gumbel":
+            done, first_action = self._run_sequential_halving(root, env, stop)
+        elif self.config.workers > 1 and stop.simulations > 0:
+            done = self._run_root_parallel(root, env, stop)
+        elif self.config.threads > 1 and stop.simulations > 0:
+            done = self._run_tree_parallel(root, env, stop)
+        else:
+            done = self._run_simulations(root, env, stop)
 
-            while True:
-                if sim_env.is_terminal() or depth >= self.config.rollout_depth:
-                    break
+        return self._finish_plan(root, done, stop, first_action)
 
-                candidate_actions = self._candidate_actions(node.state)
-                unexpanded = [
-                    action
-                    for action in candidate_actions
-                    if action.canonical() not in node.children
-                ]
-
-                if unexpanded:
-                    action = unexpanded[0]
-                    prior = self.prior_policy.score(node.state, action)
-                    prev_state = sim_env.observe()
-                    next_state = sim_env.apply(action)
-                    accumulated_value += self._reward_for_transition(
-                        prev_state=prev_state,
-                        action=action,
-                        next_state=next_state,
-                        sim_env=sim_env,
-                        discount=discount,
-                    )
-                    discount *= self.config.discount
-                    child = TreeNode(
-                        state=next_state,
-                        parent=node,
-                        action_from_parent=action,
-                        prior=prior,
-                    )
-                    node.children[action.canonical()] = child
-                    node = child
-                    path.append(node)
-                    depth += 1
-                    break
+    def _resolve_deadline(self, deadline: float | None) -> float | None:
+        if deadline is None and self.config.time_budget is not None:
+            return time.monotonic() + self.config.time_budget
+        return deadline
 
-                if not node.children:
-                    break
+    def _stop_condition(self, simulations: int, deadline: float | None) -> StopCondition:
+        return StopCondition(
+            simulations=simulations,
+            deadline=deadline,
+            min_simulations=self.config.min_simulations,
+            early_stopping=self.config.early_stopping,
+            window=self.config.convergence_window,
+            tolerance=self.config.convergence_tolerance,
+        )
 
-                child = self._select_child(node)
-                if child.action_from_parent is None:
-                    break
-                prev_state = sim_env.observe()
-                next_state = sim_env.apply(child.action_from_parent)
-                accumulated_value += self._reward_for_transition(
+    def _finish_plan(
+        self,
+        root: TreeNode,
+        simulations: int,
+        stop: StopCondition,
+        first_action: Action | None = None,
+    ) -> PlanResult:
+        self._root = root if self.config.reuse_tree else None
+        if stop.leader is not None:
+            first_action = root.child_actions[list(root.children)[stop.leader]]
+        if first_action is None:
+            actions = self._extract_best_plan(root)
+        else:
+            child = root.children[first_action.canonical()]
+            actions = [first_action, *self._extract_best_plan(child)][: self.config.rollout_depth]
+        return PlanResult(
+            actions=actions,
+            estimated_value=root.q_value,
+            simulations_run=simulations,
+            root=root,
+            stop_reason=stop.reason,
+        )
+
+    def advance(self, actions: list[Action]) -> None:
+        """Re-roots the retained tree after `actions` ran in the real env."""
+        node = self._root
+        for action in actions:
+            if node is None:
+                break
+            node = node.children.get(action.canonical())
+
+        if node is not None:
+            node.parent = None
+        self._root = node
+        self._rebuild_transpositions(node)
+        self._recount_tree(node)
+
+    def reset(self) -> None:
+        self._root = None
+        self._transpositions = {}
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _batches_leaves(self) -> bool:
+        return self.config.leaf_batch_size > 1 and not self.leaf_evaluator.steps_env
+
+    def _run_simulations(self, root: TreeNode, env: Any, stop: StopCondition) -> int:
+        if self._batches_leaves():
+            return self._run_batched_simulations(root, env, stop)
+        token = env.snapshot() if self._supports_snapshots(env) else None
+        done = 0
+
+        while not stop.should_stop(done, _child_visits(root)):
+            done += 1
+            if token is None:
+                self._simulate(root, env.clone())
+                continue
+            try:
+                self._simulate(root, env)
+            finally:
+                env.restore(token)
+
+        return done
+
+    def _run_batched_simulations(self, root: TreeNode, env: Any, stop: StopCondition) -> int:
+        """Descends `leaf_batch_size` paths, then evaluates their leaves in one call.
+
+        Queued paths hold virtual loss until their values are backed up, which
+        spreads one batch over different leaves.
+        """
+        token = env.snapshot() if self._supports_snapshots(env) else None
+        done = 0
+
+        while not stop.should_stop(done, _child_visits(root)):
+            pending: list[tuple[list[TreeNode], list[tuple[str, float]], Leaf]] = []
+            try:
+                while len(pending) < self.config.leaf_batch_size and not stop.should_stop(
+                    done, _child_visits(root)
+                ):
+                    done += 1
+                    sim_env = env if token is not None else env.clone()
+                    path = [root]
+                    expanding: list[tuple[TreeNode, str]] = []
+                    self._add_virtual_loss(root)
+                    try:
+                        edges, leaf = self._descend(sim_env, path, expanding)
+                    except BaseException:
+                        for node in path:
+                            node.virtual_visits -= 1
+                        raise
+                    finally:
+                        for node, key in expanding:
+                            node.expanding.discard(key)
+                        if token is not None:
+                            env.restore(token)
+                    pending.append((path, edges, leaf))
+
+                values = self.leaf_evaluator.evaluate_batch([leaf for _, _, leaf in pending])
+            finally:
+                for path, _, _ in pending:
+                    for node in path:
+                        node.virtual_visits -= 1
+
+            for (path, edges, _), value in zip(pending, values):
+                self._backpropagate(path, edges, value)
+            self._enforce_memory_budget(root)
+
+        return done
+
+    def _plan_with_array_tree(self, env: Any, deadline: float | None) -> PlanResult:
+        """Sequential top-k search over a fresh ArrayTree; `__init__` rejects other modes."""
+        tree = ArrayTree(self.config.discount)
+        root = tree.add_root(env.observe())
+        token = env.snapshot() if self._supports_snapshots(env) else None
+        stop = self._stop_condition(self.config.simulations, deadline)
+        done = 0
+
+        while not stop.should_stop(done, [tree.visits[child] for child in tree.children(root)]):
+            done += 1
+            sim_env = env if token is not None else env.clone()
+            try:
+                path, rewards, value = self._descend_array_tree(tree, root, sim_env)
+                tree.backpropagate(path, rewards, value)
+            finally:
+                if token is not None:
+                    env.restore(token)
+
+        summary = TreeNode(
+            state=tree.states[root],
+            visits=tree.visits[root],
+            value_sum=tree.value_sum[root],
+        )
+        for child in tree.children(root):
+            child_state = tree.states[child]
+            action = tree.actions[child]
+            if child_state is None or action is None:
+                continue
+            key = action.canonical()
+            summary.children[key] = TreeNode(
+                state=child_state,
+                parent=summary,
+                action_from_parent=action,
+                visits=tree.visits[child],
+                value_sum=tree.value_sum[child],
+            )
+            summary.child_actions[key] = action
+            summary.child_priors[key] = tree.prior[child]
+            summary.child_visits[key] = tree.visits[child]
+            summary.child_rewards[key] = tree.reward_sum[child]
+
+        if stop.leader is not None:
+            leader = tree.children(root)[stop.leader]
+            best_path = [leader, *tree.best_path(leader, self.config.rollout_depth - 1)]
+        else:
+            best_path = tree.best_path(root, self.config.rollout_depth)
+        return PlanResult(
+            actions=[tree.actions[node] for node in best_path],
+            estimated_value=tree.q_value(root),
+            simulations_run=done,
+            root=summary,
+            tree=tree,
+            stop_reason=stop.reason,
+        )
+
+    def _descend_array_tree(
+        self,
+        tree: ArrayTree,
+        root: int,
+        sim_env: Any,
+    ) -> tuple[list[int], list[float], float]:
+        sim_env = self._memoized(sim_env)
+        node = root
+        path = [root]
+        depth = 0
+        rewards: list[float] = []
+        discount = 1.0
+
+        leaf_state = tree.states[node]
+        terminal: bool | None = None
+        while True:
+            terminal = sim_env.is_terminal()
+            if terminal or depth >= self.config.rollout_depth:
+                break
+            if not tree.is_expanded(node):
+                ranked = self._ranked_candidates(tree.states[node], self.config.top_k_actions)
+                tree.expand(node, [action for action, _ in ranked], [prior for _, prior in ranked])
+            if not tree.child_count[node]:
+                break
+
+            child = tree.select_child(node, self.config.exploration_constant)
+            action = tree.actions[child]
+            prev_state = sim_env.observe()
+            next_state = sim_env.apply(action)
+            rewards.append(
+                self._reward_for_transition(
                     prev_state=prev_state,
-                    action=child.action_from_parent,
+                    action=action,
                     next_state=next_state,
                     sim_env=sim_env,
                     discount=discount,
                 )
-                discount *= self.config.discount
-                node = child
-                path.append(node)
-                depth += 1
+            )
+            discount *= self.config.discount
+            depth += 1
+            path.append(child)
+            leaf_state = next_state
+            terminal = None
 
-            value = accumulated_value + self._rollout(sim_env, depth, discount)
-            self._backpropagate(path, value)
+            if tree.states[child] is None:
+                tree.states[child] = next_state
+                break
+            node = child
 
-        actions = self._extract_best_plan(root)
-        return PlanResult(
-            actions=actions,
-            estimated_value=root.q_value,
-            simulations_run=self.config.simulations,
-            root=root,
+        leaf = Leaf(
+            state=leaf_state,
+            env=sim_env,
+            depth=depth,
+            discount=discount,
+            discount_factor=self.config.discount,
+            remaining=self.config.rollout_depth - depth,
+            terminal=sim_env.is_terminal() if terminal is None else terminal,
         )
+        return path, rewards, self.leaf_evaluator.evaluate_batch([leaf])[0]
 
-    def _candidate_actions(self, state: DOMState) -> list[Action]:
-        actions = self.action_generator.enumerate(state)
-        ranked = sorted(
-            actions,
-            key=lambda action: self.prior_policy.score(state, action),
-            reverse=True,
+    def _run_tree_parallel(self, root: TreeNode, env: Any, stop: StopCondition) -> int:
+        """Runs simulations concurrently on one shared tree.
+
+        Clones are taken one at a time under `_env_lock`, so `env.clone()`
+        need not be thread-safe. Each clone is then stepped on its own
+        thread.
+        """
+        started = 0
+        started_lock = threading.Lock()
+
+        def simulate_on_clone() -> None:
+            nonlocal started
+            while True:
+                with self._tree_lock, started_lock:
+                    if stop.should_stop(started, _child_visits(root)):
+                        return
+                    started += 1
+                with self._env_lock:
+                    sim_env = env.clone()
+                self._simulate(root, sim_env)
+
+        with ThreadPoolExecutor(max_workers=self.config.threads) as executor:
+            futures = [executor.submit(simulate_on_clone) for _ in range(self.config.threads)]
+            for future in futures:
+                future.result()
+        return started
+
+    def _run_root_parallel(self, root: TreeNode, env: Any, stop: StopCondition) -> int:
+        simulations = stop.simulations
+        workers = self.config.workers
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+
+        base_seed = self.config.seed if self.config.seed is not None else 0
+        time_budget = None
+        if stop.deadline is not None:
+            time_budget = max(0.0, stop.deadline - time.monotonic())
+        worker_config = replace(
+            self.config,
+            workers=1,
+            reuse_tree=False,
+            time_budget=time_budget,
+        )
+        # Rollouts are bound to this planner; each worker builds its own.
+        leaf_evaluator = None
+        if not isinstance(self.leaf_evaluator, RolloutEvaluator):
+            leaf_evaluator = self.leaf_evaluator
+        futures = []
+        for index in range(workers):
+            share = simulations // workers + (1 if index < simulations % workers else 0)
+            if share == 0:
+                continue
+            futures.append(
+                self._executor.submit(
+                    _search_worker,
+                    self.action_generator,
+                    self.reward_model,
+                    self.prior_policy,
+                    replace(worker_config, simulations=share, seed=base_seed + index),
+                    env,
+                    leaf_evaluator,
+                )
+            )
+
+        visits_before = root.visits
+        reasons = set()
+        for future in futures:
+            worker_root, reason = future.result()
+            _merge_tree(root, worker_root)
+            reasons.add(reason)
+        self._rebuild_transpositions(root)
+        self._recount_tree(root)
+        self._enforce_memory_budget(root)
+
+        # A deadline outranks an early stop, and an early stop outranks the
+        # workers that ran out their share.
+        for reason in ("deadline", "decided", "converged"):
+            if reason in reasons:
+                stop.reason = reason
+                break
+        if stop.reason in ("decided", "converged") and root.children:
+            # Workers judged their own trees; the merged visits pick the leader.
+            child_visits = _child_visits(root)
+            stop.leader = max(range(len(child_visits)), key=child_visits.__getitem__)
+        return root.visits - visits_before
+
+    def _reusable_root(self, root_state: DOMState) -> TreeNode:
+        root = self._root
+        if root is None or _node_fingerprint(root) != root_state.fingerprint():
+            root = TreeNode(state=root_state)
+            self._rebuild_transpositions(root)
+            self._recount_tree(root)
+        elif root.state is None:
+            self._materialize_state(root, root_state)
+        return root
+
+    def _attach_child(
+        self,
+        node: TreeNode,
+        action: Action,
+        prior: float,
+        next_state: DOMState,
+        path: list[TreeNode],
+    ) -> TreeNode:
+        key = action.canonical()
+        node.expanding.discard(key)
+        existing = node.children.get(key)
+        if existing is not None:
+            return existing
+
+        fingerprint = next_state.fingerprint() if self.config.transpositions else None
+        child = self._transpositions.get(fingerprint) if fingerprint is not None else None
+
+        # Linking back into the current path would turn the DAG into a cycle.
+        if child is None or child in path:
+            child = TreeNode(
+                state=next_state,
+                parent=node,
+                action_from_parent=action,
+                state_fingerprint=fingerprint,
+            )
+            self._tree_nodes += 1
+            self._tree_bytes += _TREE_NODE_BYTES + _estimate_state_bytes(next_state)
+            if fingerprint is not None:
+                self._transpositions.setdefault(fingerprint, child)
+
+        node.children[key] = child
+        node.child_actions[key] = action
+        node.child_priors[key] = prior
+        node.child_visits[key] = 0
+        node.child_rewards[key] = 0.0
+        return child
+
+    def _rebuild_transpositions(self, root: TreeNode | None) -> None:
+        self._transpositions = {}
+        if root is None or not self.config.transpositions:
+            return
+
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            fingerprint = _node_fingerprint(node)
+            if fingerprint in self._transpositions:
+                continue
+            self._transpositions[fingerprint] = node
+            stack.extend(node.children.values())
+
+    def _materialize_state(self, node: TreeNode, state: DOMState) -> None:
+        node.state = state
+        self._tree_bytes += _estimate_state_bytes(state)
+
+    def _recount_tree(self, root: TreeNode | None) -> None:
+        self._tree_nodes = 0
+        self._tree_bytes = 0
+        for node in _unique_nodes(root):
+            self._tree_nodes += 1
+            self._tree_bytes += _TREE_NODE_BYTES + _estimate_state_bytes(node.state)
+
+    def _over_budget(self, fraction: float) -> bool:
+        max_nodes = self.config.max_nodes
+        max_bytes = self.config.max_bytes
+        return (max_nodes is not None and self._tree_nodes > max_nodes * fraction) or (
+            max_bytes is not None and self._tree_bytes > max_bytes * fraction
+        )
+
+    def _enforce_memory_budget(self, root: TreeNode) -> None:
+        """Drops cold interior states, then prunes cold subtrees, once over budget."""
+        if not self._over_budget(1.0):
+            return
+
+        nodes = [node for node in _unique_nodes(root) if node is not root]
+        max_bytes = self.config.max_bytes
+        if max_bytes is not None and self._tree_bytes > max_bytes:
+            interior = [node for node in nodes if node.children and node.state is not None]
+            for node in sorted(interior, key=lambda item: item.visits):
+                if self._tree_bytes <= max_bytes * _EVICTION_LOW_WATER:
+                    break
+                node.state_fingerprint = _node_fingerprint(node)
+                self._tree_bytes -= _estimate_state_bytes(node.state)
+                node.state = None
+
+        if not self._over_budget(_EVICTION_LOW_WATER):
+            return
+
+        # Collapsing keeps a node's own statistics and drops everything below
+        # it, so pruned actions are not retried from scratch. The current best
+        # line is what the caller executes and is never collapsed.
+        protected = {id(root)}
+        node = root
+        for action in self._extract_best_plan(root):
+            node = node.children[action.canonical()]
+            protected.add(id(node))
+
+        collapsible = [node for node in nodes if node.children and id(node) not in protected]
+        for node in sorted(collapsible, key=lambda item: item.visits):
+            if not self._over_budget(_EVICTION_LOW_WATER):
+                break
+            if not node.children or node.virtual_visits:
+                continue
+            for pruned in _unique_nodes(node)[1:]:
+                self._tree_nodes -= 1
+                self._tree_bytes -= _TREE_NODE_BYTES + _estimate_state_bytes(pruned.state)
+            node.children.clear()
+            node.child_actions.clear()
+            node.child_priors.clear()
+            node.child_visits.clear()
+            node.child_rewards.clear()
+
+        self._rebuild_transpositions(root)
+        self._recount_tree(root)
+
+    def _supports_snapshots(self, env: Any) -> bool:
+        return self.config.use_snapshots and isinstance(env, SnapshotEnv)
+
+    def _simulate(
+        self,
+        root: TreeNode,
+        sim_env: Any,
+        root_action: tuple[Action, float] | None = None,
+    ) -> None:
+        path = [root]
+        expanding: list[tuple[TreeNode, str]] = []
+        edges: list[tuple[str, float]] = []
+        value: float | None = None
+        with self._tree_lock:
+            self._add_virtual_loss(root)
+
+        try:
+            edges, leaf = self._descend(sim_env, path, expanding, root_action)
+            value = self.leaf_evaluator.evaluate_batch([leaf])[0]
+        finally:
+            with self._tree_lock:
+                for node, key in expanding:
+                    node.expanding.discard(key)
+                if self._virtual_loss_active:
+                    for node in path:
+                        node.virtual_visits -= 1
+                if value is not None:
+                    self._backpropagate(path, edges, value)
+                    self._enforce_memory_budget(path[0])
+
+    def _descend(
+        self,
+        sim_env: Any,
+        path: list[TreeNode],
+        expanding: list[tuple[TreeNode, str]],
+        root_action: tuple[Action, float] | None = None,
+    ) -> tuple[list[tuple[str, float]], Leaf]:
+        """Walks the tree to a new or terminal leaf.
+
+        Returns the action key and discounted reward of each edge taken, in
+        path order, and the leaf to evaluate.
+        """
+        sim_env = self._memoized(sim_env)
+        node = path[-1]
+        depth = 0
+        edges: list[tuple[str, float]] = []
+        discount = 1.0
+        leaf_state = node.state
+        terminal: bool | None = None
+
+        while True:
+            terminal = sim_env.is_terminal()
+            if terminal or depth >= self.config.rollout_depth:
+                break
+
+            with self._tree_lock:
+                if node.state is None:
+                    self._materialize_state(node, sim_env.observe())
+                if root_action is not None and depth == 0:
+                    edge = self._forced_edge(node, *root_action)
+                else:
+                    edge = self._next_edge(node, path)
+                if edge is None:
+                    break
+                action, child, prior = edge
+                if child is None:
+                    expanding.append((node, action.canonical()))
+                else:
+                    self._add_virtual_loss(child)
+
+            prev_state = sim_env.observe()
+            next_state = sim_env.apply(action)
+            reward = self._reward_for_transition(
+                prev_state=prev_state,
+                action=action,
+                next_state=next_state,
+                sim_env=sim_env,
+                discount=discount,
+            )
+            edges.append((action.canonical(), reward))
+            discount *= self.config.discount
+            depth += 1
+            leaf_state = next_state
+            terminal = None
+
+            if child is None:
+                with self._tree_lock:
+                    child = self._attach_child(node, action, prior, next_state, path)
+                    self._add_virtual_loss(child)
+                path.append(child)
+                break
+
+            node = child
+            path.append(node)
+
+        leaf = Leaf(
+            state=leaf_state if leaf_state is not None else sim_env.observe(),
+            env=sim_env,
+            depth=depth,
+            discount=discount,
+            discount_factor=self.config.discount,
+            remaining=self.config.rollout_depth - depth,
+            terminal=sim_env.is_terminal() if terminal is None else terminal,
         )
-        return ranked[: self.config.top_k_actions]
+        return edges, leaf
+
+    def _next_edge(
+        self,
+        node: TreeNode,
+        path: list[TreeNode],
+    ) -> tuple[Action, TreeNode | None, float] | None:
+        """Picks the next edge below `node`; a `None` child means expand it."""
+        limit = None
+        if self.config.expansion == "progressive":
+            limit = self._widening_limit(node)
+        unexpanded = [
+            (action, prior)
+            for action, prior in self._ranked_candidates(node.state, limit)
+            if action.canonical() not in node.children
+            and action.canonical() not in node.expanding
+        ]
 
-    def _select_child(self, node: TreeNode) -> TreeNode:
+        if unexpanded:
+            action, prior = unexpanded[0]
+            if self._rng is not None:
+                tied = [candidate for candidate, score in unexpanded if score == prior]
+                action = self._rng.choice(tied)
+            node.expanding.add(action.canonical())
+            return action, None, prior
+
+        if not node.children:
+            return None
+
+        action, child = self._select_child(node)
+        if child in path:
+            return None
+        return action, child, node.child_priors[action.canonical()]
+
+    def _forced_edge(
+        self,
+        node: TreeNode,
+        action: Action,
+        prior: float,
+    ) -> tuple[Action, TreeNode | None, float]:
+        key = action.canonical()
+        child = node.children.get(key)
+        if child is None:
+            node.expanding.add(key)
+            return action, None, prior
+        return action, child, node.child_priors[key]
+
+    def _run_sequential_halving(
+        self,
+        root: TreeNode,
+        env: Any,
+        stop: StopCondition,
+    ) -> tuple[int, Action | None]:
+        """Gumbel-top-k root search with sequential halving.
+
+        Samples `gumbel_actions` root candidates without replacement by
+        Gumbel-perturbed log-prior, then splits the budget into halving
+        phases. Each phase simulates every surviving candidate equally and
+        keeps the better half by g + log(prior) + sigma(q). Below the root,
+        selection stays PUCT. Returns the simulations run and the chosen
+        root action.
+        """
+        ranked = self._ranked_candidates(root.state)
+        if not ranked:
+            return 0, None
+
+        rng = self._rng or self._gumbel_rng
+        gumbel = {
+            action.canonical(): math.log(prior)
+            - self.config.gumbel_scale * math.log(max(rng.expovariate(1.0), 1e-300))
+            for action, prior in ranked
+        }
+        survivors = sorted(ranked, key=lambda pair: gumbel[pair[0].canonical()], reverse=True)
+        survivors = survivors[: max(1, self.config.gumbel_actions)]
+
+        def halving_score(pair: tuple[Action, float]) -> float:
+            key = pair[0].canonical()
+            return gumbel[key] + self._sigma_q(root, key)
+
+        token = env.snapshot() if self._supports_snapshots(env) else None
+        phases = max(1, math.ceil(math.log2(len(survivors))))
+        done = 0
+        phase = 0
+        while not stop.should_stop(done, _child_visits(root)):
+            if phase < phases:
+                per_action = stop.simulations // (phases * len(survivors))
+            else:
+                per_action = 1
+            for _ in range(max(1, per_action)):
+                for root_action in survivors:
+                    if stop.should_stop(done, _child_visits(root)):
+                        break
+                    done += 1
+                    if token is None:
+                        self._simulate(root, env.clone(), root_action)
+                        continue
+                    try:
+                        self._simulate(root, env, root_action)
+                    finally:
+                        env.restore(token)
+            phase += 1
+            if phase <= phases and len(survivors) > 1:
+                survivors.sort(key=halving_score, reverse=True)
+                survivors = survivors[: math.ceil(len(survivors) / 2)]
+
+        visited = [pair for pair in survivors if pair[0].canonical() in root.children]
+        if not visited:
+            return done, None
+        return done, max(visited, key=halving_score)[0]
+
+    def _sigma_q(self, root: TreeNode, key: str) -> float:
+        """Monotone transform of a root edge's Q, min-max normalized over visited siblings."""
+        if not root.child_visits.get(key):
+            return 0.0
+        discount = self.config.discount
+        values = [
+            root.edge_q(sibling, discount) for sibling, visits in root.child_visits.items() if visits
+        ]
+        low, high = min(values), max(values)
+        normalized = (root.edge_q(key, discount) - low) / (high - low) if high > low else 0.5
+        max_visits = max(root.child_visits.values())
+        return (_GUMBEL_C_VISIT + max_visits) * _GUMBEL_C_SCALE * normalized
+
+    def _add_virtual_loss(self, node: TreeNode) -> None:
+        if self._virtual_loss_active:
+            node.virtual_visits += 1
+
+    def _widening_limit(self, node: TreeNode) -> int:
+        """Children `node` may have under progressive widening: ceil(C * N^alpha)."""
+        visits = node.visits + node.virtual_visits
+        allowed = self.config.widening_constant * visits**self.config.widening_exponent
+        return max(1, math.ceil(allowed))
+
+    def _ranked_candidates(
+        self,
+        state: DOMState,
+        limit: int | None = None,
+    ) -> list[tuple[Action, float]]:
+        """Best-first candidate actions with the priors they were ranked by.
+
+        At most `limit` pairs are returned; top-k expansion also caps them at
+        `top_k_actions`. Rankings are memoized by state fingerprint and only
+        sorted as far as callers have asked.
+        """
+        ranking = self._ranking(state)
+        if self.config.expansion == "top_k":
+            top_k = self.config.top_k_actions
+            limit = top_k if limit is None else min(limit, top_k)
+        elif limit is None:
+            limit = len(ranking)
+        return ranking.take(limit)
+
+    def _ranking(self, state: DOMState) -> RankedActions:
+        use_cache = self.candidate_cache.maxsize > 0
+        if use_cache:
+            fingerprint = state.fingerprint()
+            cached = self.candidate_cache.get(fingerprint)
+            if cached is not None:
+                return cached
+
+        actions = self.action_generator.enumerate(state)
+        ranking = RankedActions(actions, self.prior_policy.score_batch(state, actions))
+        if use_cache:
+            self.candidate_cache.put(fingerprint, ranking)
+        return ranking
+
+    def _select_child(self, node: TreeNode) -> tuple[Action, TreeNode]:
         assert node.children, "Cannot select a child from a leaf node"
-        parent_visits = max(node.visits, 1)
+        parent_visits = max(node.visits + node.virtual_visits, 1)
+        virtual_loss = self.config.virtual_loss
+        discount = self.config.discount
 
-        def score(child: TreeNode) -> float:
+        def score(key: str) -> float:
+            # In-flight simulations count as visits that returned -virtual_loss.
+            edge_visits = node.child_visits[key]
+            in_flight = node.children[key].virtual_visits
+            visits = edge_visits + in_flight
+            q_value = 0.0
+            if visits:
+                q_value = (
+                    edge_visits * node.edge_q(key, discount) - virtual_loss * in_flight
+                ) / visits
             exploration = (
                 self.config.exploration_constant
-                * child.prior
+                * node.child_priors[key]
                 * math.sqrt(parent_visits)
-                / (1 + child.visits)
+                / (1 + visits)
             )
-            return child.q_value + exploration
+            return q_value + exploration
 
-        return max(node.children.values(), key=score)
+        if self._rng is None:
+            key = max(node.children, key=score)
+        else:
+            rng = self._rng
+            key = max(node.children, key=lambda key: (score(key), rng.random()))
+        return node.child_actions[key], node.children[key]
 
     def _reward_for_transition(
         self,
@@ -170,6 +980,11 @@ class MCTSPlanner:
         sim_env: Any,
         discount: float,
     ) -> float:
+        # Rewards are memoized only on transitions the deterministic cache
+        # already holds; hashing next states just to skip scoring costs more.
+        transition = sim_env.last if isinstance(sim_env, MemoizedEnv) else None
+        if transition is not None and transition.reward is not None:
+            return discount * transition.reward.total
         breakdown = self.reward_model.evaluate(
             prev_state=prev_state,
             action=action,
@@ -177,19 +992,26 @@ class MCTSPlanner:
             is_terminal=sim_env.is_terminal(),
             is_success=sim_env.is_success(),
         )
+        if transition is not None:
+            transition.reward = breakdown
         return discount * breakdown.total
 
+    def _memoized(self, sim_env: Any) -> Any:
+        if self.transition_cache.maxsize:
+            return MemoizedEnv(sim_env, self.transition_cache)
+        return sim_env
+
     def _rollout(self, sim_env: Any, depth: int, discount: float) -> float:
         total = 0.0
         current_depth = depth
 
         while not sim_env.is_terminal() and current_depth < self.config.rollout_depth:
             state = sim_env.observe()
-            candidates = self._candidate_actions(state)
+            candidates = self._ranked_candidates(state, 1)
             if not candidates:
                 break
 
-            action = candidates[0]
+            action = candidates[0][0]
             prev_state = state
             next_state = sim_env.apply(action)
             total += self._reward_for_transition(
@@ -204,12 +1026,35 @@ class MCTSPlanner:
 
         return total
 
-    def _backpropagate(self, path: list[TreeNode], value: float) -> None:
+    def _backpropagate(
+        self,
+        path: list[TreeNode],
+        edges: list[tuple[str, float]],
+        value: float,
+    ) -> None:
+        """Credits every node on `path` with the return from its own state.
+
+        `edges[i]` holds the action key and reward of the step from
+        `path[i]` to `path[i + 1]`. The rewards and `value`, the leaf
+        estimate, are discounted from `path[0]`. Each return is rescaled to
+        its node's depth, so statistics stay on one scale when `advance`
+        re-roots the tree. Edge rewards go to the parent's per-edge
+        statistics and never into a shared node's own value.
+        """
+        discount = self.config.discount
         running = value
-        for node in reversed(path):
+        for depth in range(len(path) - 1, -1, -1):
+            scale = discount**depth
+            node = path[depth]
             node.visits += 1
-            node.value_sum += running
-            running *= self.config.discount
+            node.value_sum += running / scale if scale else running
+            if depth:
+                key, reward = edges[depth - 1]
+                parent = path[depth - 1]
+                parent_scale = discount ** (depth - 1)
+                parent.child_visits[key] += 1
+                parent.child_rewards[key] += reward / parent_scale if parent_scale else reward
+                running += reward
 
     def _extract_best_plan(self, root: TreeNode) -> list[Action]:
         plan: list[Action] = []
@@ -218,13 +1063,112 @@ class MCTSPlanner:
         for _ in range(self.config.rollout_depth):
             if not node.children:
                 break
-            best_child = max(
-                node.children.values(),
-                key=lambda child: (child.q_value, child.visits),
+            best_key = max(
+                node.children,
+                key=lambda key: (
+                    node.edge_q(key, self.config.discount),
+                    node.child_visits[key],
+                ),
             )
-            if best_child.action_from_parent is None:
-                break
-            plan.append(best_child.action_from_parent)
-            node = best_child
+            plan.append(node.child_actions[best_key])
+            node = node.children[best_key]
 
         return plan
+
+
+def _search_worker(
+    action_generator: ActionGenerator,
+    reward_model: RewardModel,
+    prior_policy: PriorPolicy,
+    config: MCTSConfig,
+    env: Any,
+    leaf_evaluator: LeafEvaluator | None = None,
+) -> tuple[TreeNode, StopReason]:
+    planner = MCTSPlanner(
+        action_generator=action_generator,
+        reward_model=reward_model,
+        prior_policy=prior_policy,
+        config=config,
+        leaf_evaluator=leaf_evaluator,
+    )
+    root = TreeNode(state=env.observe())
+    deadline = planner._resolve_deadline(None)
+    stop = planner._stop_condition(config.simulations, deadline)
+    planner._run_simulations(root, env, stop)
+    return root, stop.reason
+
+
+def _merge_tree(into: TreeNode, other: TreeNode) -> None:
+    """Adds the statistics of `other` into `into`, matching children by action key."""
+    merged: dict[int, TreeNode] = {}
+    stack = [(into, other)]
+    while stack:
+        target, source = stack.pop()
+        if id(source) in merged:
+            continue
+        merged[id(source)] = target
+        target.visits += source.visits
+        target.value_sum += source.value_sum
+
+        for key, source_child in source.children.items():
+            target.child_actions[key] = source.child_actions[key]
+            target.child_priors[key] = source.child_priors[key]
+            target.child_visits[key] = target.child_visits.get(key, 0) + source.child_visits[key]
+            target.child_rewards[key] = (
+                target.child_rewards.get(key, 0.0) + source.child_rewards[key]
+            )
+            existing = target.children.get(key)
+            if existing is not None:
+                stack.append((existing, source_child))
+                continue
+            if id(source_child) in merged:
+                target.children[key] = merged[id(source_child)]
+            else:
+                source_child.parent = target
+                target.children[key] = source_child
+                adopted = [source_child]
+                while adopted:
+                    node = adopted.pop()
+                    if id(node) not in merged:
+                        merged[id(node)] = node
+                        adopted.extend(node.children.values())
+
+
+def _reject_unsupported(planner: str, options: dict[str, bool]) -> None:
+    """Raises ValueError naming every option in `options` that is set."""
+    unsupported = [name for name, is_set in options.items() if is_set]
+    if unsupported:
+        raise ValueError(f"{planner} does not support {', '.join(unsupported)}")
+
+
+def _child_visits(node: TreeNode) -> list[int]:
+    return [node.child_visits[key] for key in node.children]
+
+
+def _unique_nodes(root: TreeNode | None) -> list[TreeNode]:
+    if root is None:
+        return []
+    seen: set[int] = set()
+    nodes: list[TreeNode] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        nodes.append(node)
+        stack.extend(node.children.values())
+    return nodes
+
+
+def _node_fingerprint(node: TreeNode) -> int:
+    if node.state_fingerprint is None:
+        assert node.state is not None, "Evicted nodes keep their fingerprint"
+        node.state_fingerprint = node.state.fingerprint()
+    return node.state_fingerprint
+
+
+def _estimate_state_bytes(state: DOMState | None) -> int:
+    if state is None:
+        return 0
+    return _STATE_BYTES + _DOM_NODE_BYTES * len(state.nodes)
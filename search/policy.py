@@ -1,41 +1,112 @@
 from __future__ import annotations
 
+import heapq
+import threading
+
 from action_space.actions import Action
 from core.models import DOMState
 
 
 class PriorPolicy:
-    """Simple heuristic prior over candidate actions."""
+    """Simple heuristic prior over candidate actions.
+
+    Every action is described by a row of binary features. Its prior is
+    `BIAS` plus the row's dot product with `WEIGHTS`, floored at 0.01.
+    """
+
+    FEATURES = (
+        "type",
+        "type_filled",
+        "type_required",
+        "click",
+        "click_submit",
+        "submit_blocked",
+        "select",
+        "scroll",
+        "destructive",
+        "repeated",
+    )
+    WEIGHTS = (0.45, -0.8, 0.4, 0.2, 0.4, -0.45, 0.15, -0.08, -0.5, -0.4)
+    BIAS = 0.05
+    FLOOR = 0.01
+    SUBMIT_NODE_ID = "n_submit"
 
     def score(self, state: DOMState, action: Action) -> float:
-        score = 0.05
+        return self.score_batch(state, [action])[0]
+
+    def score_batch(self, state: DOMState, actions: list[Action]) -> list[float]:
+        """Scores a whole candidate set against one shared view of `state`."""
+        matrix = self.feature_matrix(state, actions)
+        weights = self.WEIGHTS
+        scores: list[float] = []
+        for row in matrix:
+            score = self.BIAS
+            for weight, value in zip(weights, row):
+                if value:
+                    score += weight
+            scores.append(max(score, self.FLOOR))
+        return scores
 
-        if action.action_type == "type":
-            score += 0.45
-            if action.node_id and state.metadata.get(f"filled:{action.node_id}") == "true":
-                score -= 0.8
-            if action.node_id:
+    def feature_matrix(self, state: DOMState, actions: list[Action]) -> list[tuple[int, ...]]:
+        history = set(state.interaction_history)
+        submit_blocked = state.metadata.get("all_required_filled") != "true"
+        matrix: list[tuple[int, ...]] = []
+
+        for action in actions:
+            is_type = action.action_type == "type"
+            is_click = action.action_type == "click"
+            filled = required = False
+            if is_type and action.node_id:
+                filled = state.metadata.get(f"filled:{action.node_id}") == "true"
                 node = state.nodes.get(action.node_id)
-                if node and node.attributes.get("required") == "true":
-                    score += 0.4
+                required = node is not None and node.attributes.get("required") == "true"
+            is_submit = is_click and action.node_id == self.SUBMIT_NODE_ID
+
+            matrix.append(
+                (
+                    int(is_type),
+                    int(filled),
+                    int(required),
+                    int(is_click),
+                    int(is_submit),
+                    int(is_submit and submit_blocked),
+                    int(action.action_type == "select"),
+                    int(action.action_type == "scroll"),
+                    int(action.metadata.get("destructive") == "true"),
+                    int(action.canonical() in history),
+                )
+            )
+
+        return matrix
+
 
-        if action.action_type == "click":
-            score += 0.2
-            if action.node_id == "n_submit":
-                score += 0.4
-                if state.metadata.get("all_required_filled") != "true":
-                    score -= 0.45
+class RankedActions:
+    """Candidate actions in descending prior order, sorted on demand.
 
-        if action.action_type == "select":
-            score += 0.15
+    Actions sit in a heap and are popped into the ranked prefix only when a
+    caller asks for more of them, so the first `n` cost O(len + n log len)
+    rather than a full sort. Ties keep enumeration order, as `sorted` does.
+    """
 
-        if action.action_type == "scroll":
-            score -= 0.08
+    __slots__ = ("_heap", "_ranked", "_lock")
 
-        if action.metadata.get("destructive") == "true":
-            score -= 0.5
+    def __init__(self, actions: list[Action], priors: list[float]) -> None:
+        self._heap = [
+            (-prior, index, action)
+            for index, (action, prior) in enumerate(zip(actions, priors))
+        ]
+        heapq.heapify(self._heap)
+        self._ranked: list[tuple[Action, float]] = []
+        self._lock = threading.Lock()
 
-        if action.canonical() in state.interaction_history:
-            score -= 0.4
+    def __len__(self) -> int:
+        return len(self._ranked) + len(self._heap)
 
-        return max(score, 0.01)
+    def take(self, count: int) -> list[tuple[Action, float]]:
+        """The `count` highest-prior (action, prior) pairs, best first."""
+        if count > len(self._ranked) and self._heap:
+            with self._lock:
+                while len(self._ranked) < count and self._heap:
+                    negated, _, action = heapq.heappop(self._heap)
+                    self._ranked.append((action, -negated))
+        return self._ranked[:count]
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import time
+from typing import Literal
+
+StopReason = Literal["budget", "deadline", "decided", "converged"]
+
+
+class StopCondition:
+    """Decides when an anytime search may return before its simulation budget.
+
+    Checks run only after `min_simulations`. "deadline" fires once the
+    wall-clock deadline has passed. "decided" fires once the most-visited
+    root action leads the runner-up by more visits than the budget has left.
+    "converged" fires once that action's visit share has moved by less than
+    `tolerance` over `window` consecutive simulations.
+
+    Both early stops judge the root by visit counts. `leader` is then the
+    index into `child_visits` of the action they judged settled, and the
+    planner returns that action first.
+    """
+
+    def __init__(
+        self,
+        simulations: int,
+        deadline: float | None = None,
+        min_simulations: int = 0,
+        early_stopping: bool = False,
+        window: int = 16,
+        tolerance: float = 0.02,
+    ) -> None:
+        self.simulations = simulations
+        self.deadline = deadline
+        self.min_simulations = min_simulations
+        self.early_stopping = early_stopping
+        self.window = max(1, window)
+        self.tolerance = tolerance
+        self.reason: StopReason = "budget"
+        self.leader: int | None = None
+        self._leader: int | None = None
+        self._leader_share = 0.0
+        self._stable_for = 0
+
+    def should_stop(self, done: int, child_visits: list[int]) -> bool:
+        if done >= self.simulations:
+            self.reason = "budget"
+            return True
+        if done < self.min_simulations:
+            return False
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = "deadline"
+            return True
+        if not self.early_stopping or len(child_visits) < 2:
+            return False
+
+        ranked = sorted(range(len(child_visits)), key=child_visits.__getitem__, reverse=True)
+        best, runner_up = child_visits[ranked[0]], child_visits[ranked[1]]
+        if best - runner_up > self.simulations - done:
+            self.reason = "decided"
+            self.leader = ranked[0]
+            return True
+
+        share = best / max(sum(child_visits), 1)
+        if ranked[0] == self._leader and abs(share - self._leader_share) < self.tolerance:
+            self._stable_for += 1
+        else:
+            self._leader = ranked[0]
+            self._leader_share = share
+            self._stable_for = 0
+        if self._stable_for >= self.window:
+            self.reason = "converged"
+            self.leader = ranked[0]
+            return True
+        return False
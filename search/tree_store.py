@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import math
+from array import array
+
+from action_space.actions import Action
+from core.models import DOMState
+
+_UNEXPANDED = -1
+
+
+class ArrayTree:
+    """Struct-of-arrays search tree indexed by integer node id.
+
+    Statistics live in contiguous typed arrays instead of one object per node.
+    When a node is expanded, all of its ranked candidates are allocated as one
+    contiguous block of children, so PUCT selection scans a single slice of
+    each array. A child's state is stored only once a simulation has stepped
+    into it.
+
+    As with `TreeNode`, `value_sum` is the return from a node's own state and
+    `reward_sum` holds the undiscounted rewards of the edge into it.
+    """
+
+    def __init__(self, discount: float = 1.0) -> None:
+        self.discount = discount
+        self.visits = array("q")
+        self.value_sum = array("d")
+        self.reward_sum = array("d")
+        self.prior = array("d")
+        self.parent = array("q")
+        self.first_child = array("q")
+        self.child_count = array("q")
+        self.actions: list[Action | None] = []
+        self.states: list[DOMState | None] = []
+
+    def __len__(self) -> int:
+        return len(self.visits)
+
+    def add_root(self, state: DOMState) -> int:
+        return self._allocate(parent=-1, action=None, prior=1.0, state=state)
+
+    def is_expanded(self, node: int) -> bool:
+        return self.child_count[node] != _UNEXPANDED
+
+    def children(self, node: int) -> range:
+        count = max(self.child_count[node], 0)
+        start = self.first_child[node]
+        return range(start, start + count)
+
+    def expand(self, node: int, actions: list[Action], priors: list[float]) -> range:
+        start = len(self)
+        for action, prior in zip(actions, priors):
+            self._allocate(parent=node, action=action, prior=prior, state=None)
+        self.first_child[node] = start
+        self.child_count[node] = len(actions)
+        return self.children(node)
+
+    def q_value(self, node: int) -> float:
+        visits = self.visits[node]
+        return self.value_sum[node] / visits if visits else 0.0
+
+    def edge_q(self, node: int) -> float:
+        """Mean return of the edge into `node`, measured from its parent."""
+        visits = self.visits[node]
+        if not visits:
+            return 0.0
+        return (self.reward_sum[node] + self.discount * self.value_sum[node]) / visits
+
+    def select_child(self, node: int, exploration_constant: float) -> int:
+        start = self.first_child[node]
+        stop = start + self.child_count[node]
+        assert stop > start, "Cannot select a child from a leaf node"
+
+        visits = self.visits[start:stop]
+        value_sum = self.value_sum[start:stop]
+        reward_sum = self.reward_sum[start:stop]
+        prior = self.prior[start:stop]
+        discount = self.discount
+        scale = exploration_constant * math.sqrt(max(self.visits[node], 1))
+        scores = [
+            ((reward + discount * total) / count if count else 0.0) + scale * weight / (1 + count)
+            for count, total, reward, weight in zip(visits, value_sum, reward_sum, prior)
+        ]
+        return start + scores.index(max(scores))
+
+    def backpropagate(self, path: list[int], rewards: list[float], value: float) -> None:
+        """Credits each node from its own state; see `MCTSPlanner._backpropagate`."""
+        running = value
+        for depth in range(len(path) - 1, -1, -1):
+            scale = self.discount**depth
+            node = path[depth]
+            self.visits[node] += 1
+            self.value_sum[node] += running / scale if scale else running
+            if depth:
+                reward = rewards[depth - 1]
+                parent_scale = self.discount ** (depth - 1)
+                self.reward_sum[node] += reward / parent_scale if parent_scale else reward
+                running += reward
+
+    def best_path(self, root: int, max_depth: int) -> list[int]:
+        path: list[int] = []
+        node = root
+        for _ in range(max_depth):
+            visited = [child for child in self.children(node) if self.visits[child]]
+            if not visited:
+                break
+            node = max(visited, key=lambda child: (self.edge_q(child), self.visits[child]))
+            path.append(node)
+        return path
+
+    def nbytes(self) -> int:
+        """Bytes held by the statistics arrays, excluding actions and states."""
+        return sum(
+            column.itemsize * len(column)
+            for column in (
+                self.visits,
+                self.value_sum,
+                self.reward_sum,
+                self.prior,
+                self.parent,
+                self.first_child,
+                self.child_count,
+            )
+        )
+
+    def _allocate(
+        self,
+        parent: int,
+        action: Action | None,
+        prior: float,
+        state: DOMState | None,
+    ) -> int:
+        self.visits.append(0)
+        self.value_sum.append(0.0)
+        self.reward_sum.append(0.0)
+        self.prior.append(prior)
+        self.parent.append(parent)
+        self.first_child.append(0)
+        self.child_count.append(_UNEXPANDED)
+        self.actions.append(action)
+        self.states.append(state)
+        return len(self.visits) - 1
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import copy
+import pickle
+import unittest
+from dataclasses import FrozenInstanceError
+
+from action_space import Action
+
+
+class ActionTests(unittest.TestCase):
+    def test_canonical_key_is_computed_once(self) -> None:
+        action = Action(action_type="click", node_id="n_cancel", metadata={"destructive": "true"})
+        self.assertEqual(action.canonical(), "click:n_cancel:_:destructive=true")
+        self.assertIs(action.canonical(), action.canonical())
+
+    def test_equal_actions_hash_together(self) -> None:
+        first = Action(action_type="type", node_id="n_name", value="x", metadata={"b": "2", "a": "1"})
+        second = Action(action_type="type", node_id="n_name", value="x", metadata={"a": "1", "b": "2"})
+        self.assertEqual(first, second)
+        self.assertEqual(len({first, second}), 1)
+        self.assertNotEqual(first, Action(action_type="type", node_id="n_name", value="y"))
+
+    def test_actions_are_immutable(self) -> None:
+        action = Action(action_type="scroll", node_id="viewport", value="300")
+        with self.assertRaises(FrozenInstanceError):
+            action.value = "600"  # type: ignore[misc]
+        with self.assertRaises(TypeError):
+            action.metadata["destructive"] = "true"  # type: ignore[index]
+
+    def test_identifiers_are_interned(self) -> None:
+        node_id = "".join(["n_", "email"])
+        first = Action(action_type="type", node_id=node_id, value="x")
+        second = Action(action_type="type", node_id="n_email", value="x")
+        self.assertIs(first.node_id, second.node_id)
+
+    def test_pickle_and_copy_round_trip(self) -> None:
+        action = Action(action_type="click", node_id="n_cancel", metadata={"destructive": "true"})
+        restored = pickle.loads(pickle.dumps(action))
+        self.assertEqual(restored, action)
+        self.assertEqual(dict(restored.metadata), {"destructive": "true"})
+        self.assertIs(copy.deepcopy(action), action)
+
+
+if __name__ == "__main__":
+    unittest.main()
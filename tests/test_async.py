@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+
+from action_space import ActionGenerator
+from reward import RewardModel
+from runner import AsyncAgentRunner, AsyncEnvAdapter, MockBrowserEnv
+from search import AsyncMCTSPlanner, MCTSConfig, PriorPolicy
+
+
+def build_async_planner(concurrency: int = 8) -> AsyncMCTSPlanner:
+    return AsyncMCTSPlanner(
+        action_generator=ActionGenerator(default_input_text="seed"),
+        reward_model=RewardModel(),
+        prior_policy=PriorPolicy(),
+        config=MCTSConfig(
+            simulations=60,
+            rollout_depth=5,
+            top_k_actions=8,
+            concurrency=concurrency,
+        ),
+    )
+
+
+class AsyncPlannerTests(unittest.TestCase):
+    def test_rejects_options_it_does_not_implement(self) -> None:
+        for option, value in (
+            ("root_selection", "gumbel"),
+            ("workers", 2),
+            ("threads", 2),
+            ("tree_store", "arrays"),
+            ("transition_cache_size", 64),
+            ("leaf_batch_size", 4),
+        ):
+            with self.assertRaisesRegex(ValueError, option):
+                AsyncMCTSPlanner(
+                    action_generator=ActionGenerator(),
+                    reward_model=RewardModel(),
+                    prior_policy=PriorPolicy(),
+                    config=MCTSConfig(**{option: value}),
+                )
+
+    def test_plan_runs_full_budget_without_leaking_virtual_loss(self) -> None:
+        planner = build_async_planner()
+        result = asyncio.run(planner.plan(AsyncEnvAdapter(MockBrowserEnv(), latency=0.001)))
+
+        self.assertEqual(result.simulations_run, 60)
+        self.assertEqual(result.root.visits, 60)
+        stack = [result.root]
+        while stack:
+            node = stack.pop()
+            self.assertEqual(node.virtual_visits, 0)
+            stack.extend(node.children.values())
+        self.assertNotEqual(result.actions[0].canonical(), "click:n_cancel:_:destructive=true")
+
+    def test_concurrency_limit_is_respected(self) -> None:
+        in_flight = 0
+        peak = 0
+
+        class CountingEnv(AsyncEnvAdapter):
+            async def apply(self, action: object) -> object:
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                try:
+                    return await super().apply(action)
+                finally:
+                    in_flight -= 1
+
+            async def clone(self) -> CountingEnv:
+                return CountingEnv(self.env.clone(), latency=self.latency)
+
+        asyncio.run(build_async_planner(concurrency=3).plan(CountingEnv(MockBrowserEnv(), latency=0.001)))
+        self.assertGreater(peak, 1)
+        self.assertLessEqual(peak, 3)
+
+    def test_async_runner_solves_mock_form_task(self) -> None:
+        runner = AsyncAgentRunner(planner=build_async_planner(), execute_prefix=1)
+        result = asyncio.run(runner.run_episode(AsyncEnvAdapter(MockBrowserEnv())))
+        self.assertTrue(result.success)
+
+
+if __name__ == "__main__":
+    unittest.main()
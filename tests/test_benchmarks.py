@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import unittest
+
+from action_space import Action
+from benchmarks import BenchmarkCase, SyntheticFormEnv, SyntheticSpec, run_case, run_suite
+from benchmarks.runner import compare, percentile
+from search import MCTSConfig
+
+
+def fill_page(env: SyntheticFormEnv, page: int, fields: int) -> None:
+    for index in range(fields):
+        env.apply(Action(action_type="type", node_id=f"n_p{page}_f{index}", value="x"))
+    env.apply(Action(action_type="click", node_id="n_submit"))
+
+
+class SyntheticFormEnvTests(unittest.TestCase):
+    def test_multi_page_flow_and_dom_size(self) -> None:
+        env = SyntheticFormEnv(SyntheticSpec(fields=3, distractors=2, pages=2, dom_nodes=200))
+        state = env.observe()
+        self.assertEqual(len(state.nodes), 200)
+        self.assertEqual(state.nodes["n_submit"].text, "next")
+        self.assertEqual(len(list(state.actionable_nodes())), 3 + 2 + 1 + 1)
+
+        fill_page(env, 0, 3)
+        self.assertEqual(env.observe().metadata["page"], "1")
+        self.assertEqual(env.observe().nodes["n_submit"].text, "submit")
+        token = env.snapshot()
+        fill_page(env, 1, 3)
+        self.assertTrue(env.is_success())
+
+        env.restore(token)
+        self.assertFalse(env.is_terminal())
+        env.apply(Action(action_type="click", node_id="n_cancel0"))
+        self.assertTrue(env.is_terminal())
+        self.assertFalse(env.is_success())
+
+    def test_clones_share_call_counts_and_pages(self) -> None:
+        env = SyntheticFormEnv(SyntheticSpec(dom_nodes=500))
+        clone = env.clone()
+        clone.apply(Action(action_type="type", node_id="n_p0_f0", value="x"))
+
+        self.assertEqual(env.calls.as_dict()["apply"], 1)
+        self.assertEqual(env.calls.clone, 1)
+        self.assertEqual(env.observe().nodes["n_p0_f0"].text, "")
+        self.assertGreater(env.observe().nodes.shares_structure_with(clone.observe().nodes), 0)
+
+
+class BenchmarkRunnerTests(unittest.TestCase):
+    def test_report_is_json_serializable_and_consistent(self) -> None:
+        case = BenchmarkCase(
+            name="small/puct",
+            spec=SyntheticSpec(),
+            config=MCTSConfig(simulations=16, rollout_depth=4, top_k_actions=6, seed=0),
+        )
+        report = json.loads(json.dumps(run_suite([case], episodes=2)))
+        result = report["results"][0]
+
+        self.assertEqual(result["case"], "small/puct")
+        self.assertGreater(result["plans"], 0)
+        self.assertLessEqual(result["simulations"], 16 * result["plans"])
+        self.assertGreater(result["sims_per_sec"], 0)
+        self.assertLessEqual(result["plan_p50_ms"], result["plan_p99_ms"])
+        self.assertGreater(result["peak_memory_bytes"], 0)
+        self.assertGreater(result["env_calls_per_plan"]["apply"], 0)
+        self.assertEqual(result["config"]["simulations"], 16)
+
+        ratios = compare(report, report)
+        self.assertEqual(ratios["small/puct"]["sims_per_sec"], 1.0)
+
+    def test_run_case_without_memory_pass(self) -> None:
+        case = BenchmarkCase(
+            name="tiny",
+            spec=SyntheticSpec(fields=1, destructive=0),
+            config=MCTSConfig(simulations=8, rollout_depth=3, seed=0),
+        )
+        result = run_case(case, episodes=1, measure_memory=False)
+        self.assertIsNone(result.peak_memory_bytes)
+        self.assertEqual(result.success_rate, 1.0)
+
+    def test_percentile_uses_nearest_rank(self) -> None:
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 0.5), 50.0)
+        self.assertEqual(percentile(values, 0.99), 99.0)
+        self.assertEqual(percentile([3.0], 0.99), 3.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import io
+import unittest
+from typing import Callable
+
+from action_space import Action, ActionGenerator
+from core import DOMState
+from dom_encoder import CompactDOM, DOMCompactor, DOMEncoder, iter_jsonl_snapshot
+from reward import RewardModel
+from runner import MockBrowserEnv
+from search import MCTSConfig, MCTSPlanner, PriorPolicy
+
+
+def build_snapshot(count: int) -> dict:
+    return {
+        "url": "https://example.test/list",
+        "focused_node_id": 3,
+        "history": ["scroll:viewport:300:"],
+        "metadata": {"zeta": 1, "alpha": True},
+        "step": 2,
+        "nodes": [
+            {
+                "id": f"n{count - index}",
+                "tag": "LI",
+                "text": f"item {index}",
+                "attributes": {"data-index": index},
+                "interactable": index % 3 == 0,
+                "children": [],
+            }
+            for index in range(count)
+        ],
+    }
+
+
+class DOMEncoderTests(unittest.TestCase):
+    def test_encode_is_canonical_without_a_second_pass(self) -> None:
+        encoder = DOMEncoder()
+        state = encoder.encode(build_snapshot(300))
+
+        self.assertEqual(list(state.nodes), sorted(state.nodes))
+        self.assertEqual(list(state.metadata), ["alpha", "zeta"])
+        self.assertEqual(state.metadata["alpha"], "True")
+        self.assertEqual(state.focused_node_id, "3")
+        self.assertEqual(state.nodes["n300"].tag, "li")
+        self.assertEqual(encoder.canonicalize(state), state)
+
+    def test_jsonl_stream_matches_in_memory_encode(self) -> None:
+        snapshot = build_snapshot(150)
+        handle = io.StringIO("".join(iter_jsonl_snapshot(snapshot)))
+        streamed = DOMEncoder().encode_jsonl(handle)
+
+        self.assertEqual(streamed, DOMEncoder().encode(snapshot))
+        self.assertEqual(streamed.fingerprint(), DOMEncoder().encode(snapshot).fingerprint())
+
+    def test_encode_iter_accepts_a_generator(self) -> None:
+        raw_nodes = ({"tag": "span", "text": str(index)} for index in range(5))
+        state = DOMEncoder().encode_iter(raw_nodes, header={"url": "about:test"})
+
+        self.assertEqual(list(state.nodes), ["n0", "n1", "n2", "n3", "n4"])
+        self.assertEqual(state.url, "about:test")
+
+    def test_duplicate_ids_keep_the_last_node(self) -> None:
+        state = DOMEncoder().encode(
+            {"nodes": [{"id": "a", "text": "first"}, {"id": "a", "text": "second"}]}
+        )
+        self.assertEqual(len(state.nodes), 1)
+        self.assertEqual(state.nodes["a"].text, "second")
+
+
+class EncodeDeltaTests(unittest.TestCase):
+    def test_delta_matches_full_reencode_and_shares_structure(self) -> None:
+        encoder = DOMEncoder()
+        snapshot = build_snapshot(400)
+        prev_state = encoder.encode(snapshot)
+        prev_fingerprint = prev_state.fingerprint()
+
+        nodes = {raw["id"]: dict(raw) for raw in snapshot["nodes"]}
+        del nodes["n7"]
+        nodes["n10"] = {**nodes["n10"], "text": "edited", "attributes": {"checked": True}}
+        nodes["x1"] = {"id": "x1", "tag": "DIV", "text": "toast"}
+        after = {
+            **snapshot,
+            "nodes": list(nodes.values()),
+            "metadata": {"alpha": True, "beta": 2},
+            "step": 3,
+        }
+        delta = encoder.encode_delta(
+            prev_state,
+            {
+                "removed": ["n7"],
+                "added": [{"id": "x1", "tag": "DIV", "text": "toast"}],
+                "changed": [{"id": "n10", "text": "edited", "attributes": {"checked": True}}],
+                "metadata": {"zeta": None, "beta": 2},
+                "step": 3,
+            },
+        )
+
+        expected = encoder.encode(after)
+        self.assertEqual(delta, expected)
+        self.assertEqual(list(delta.metadata), list(expected.metadata))
+        self.assertEqual(delta.fingerprint(), expected.fingerprint())
+        self.assertEqual(prev_state.fingerprint(), prev_fingerprint)
+        self.assertIn("n7", prev_state.nodes)
+        self.assertGreater(delta.nodes.shares_structure_with(prev_state.nodes), 0)
+
+    def test_unknown_ids_are_rejected(self) -> None:
+        prev_state = DOMEncoder().encode(build_snapshot(3))
+        with self.assertRaises(KeyError):
+            DOMEncoder().encode_delta(prev_state, {"changed": [{"id": "missing", "text": "x"}]})
+        with self.assertRaises(KeyError):
+            DOMEncoder().encode_delta(prev_state, {"removed": ["missing"]})
+        with self.assertRaises(ValueError):
+            DOMEncoder().encode_delta(prev_state, {"added": [{"tag": "p"}]})
+
+    def test_diff_round_trips_through_decode_and_encode_delta(self) -> None:
+        encoder = DOMEncoder()
+        prev_state = encoder.encode(build_snapshot(50))
+        next_state = prev_state.clone()
+        next_state.remove_node("n4")
+        next_state.update_node("n9", text="edited")
+        next_state.metadata.pop("zeta")
+        next_state.metadata["beta"] = "2"
+        next_state.step += 1
+
+        mutations = encoder.diff(prev_state, next_state)
+        self.assertEqual(mutations["removed"], ["n4"])
+        self.assertEqual([raw["id"] for raw in mutations["added"]], ["n9"])
+        self.assertEqual(encoder.encode_delta(prev_state, mutations), next_state)
+        self.assertEqual(encoder.encode(encoder.decode(next_state)), next_state)
+
+
+class CompactingEnv:
+    """Shows the planner compacted observations of a wrapped env."""
+
+    def __init__(self, env: MockBrowserEnv, compactor: DOMCompactor) -> None:
+        self.env = env
+        self.compactor = compactor
+        self.compact: CompactDOM | None = None
+
+    def clone(self) -> CompactingEnv:
+        return CompactingEnv(self.env.clone(), self.compactor)
+
+    def observe(self) -> DOMState:
+        self.compact = self.compactor.compact(self.env.observe())
+        return self.compact.state
+
+    def apply(self, action: Action) -> DOMState:
+        if self.compact is None:
+            self.observe()
+        self.env.apply(self.compact.original_action(action))
+        return self.observe()
+
+    def is_terminal(self) -> bool:
+        return self.env.is_terminal()
+
+    def is_success(self) -> bool:
+        return self.env.is_success()
+
+
+class DOMCompactorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.state = DOMEncoder().encode(
+            {
+                "url": "https://example.test/signup",
+                "metadata": {"filled:email": "false"},
+                "nodes": [
+                    {"id": "body", "tag": "body", "children": ["outer", "banner", "hidden", "note"]},
+                    {"id": "outer", "tag": "div", "attributes": {"class": "row"}, "children": ["inner"]},
+                    {"id": "inner", "tag": "div", "children": ["email"]},
+                    {
+                        "id": "email",
+                        "tag": "input",
+                        "interactable": True,
+                        "attributes": {"placeholder": "email", "required": "true", "class": "x"},
+                    },
+                    {"id": "banner", "tag": "div", "role": "alert", "text": "Welcome"},
+                    {"id": "hidden", "tag": "div", "visible": False, "children": ["secret"]},
+                    {"id": "secret", "tag": "button", "interactable": True},
+                    {"id": "note", "tag": "p", "text": "Terms apply"},
+                ],
+            }
+        )
+
+    def test_drops_hidden_subtrees_text_and_wrappers(self) -> None:
+        compact = DOMCompactor().compact(self.state)
+        nodes = compact.state.nodes
+
+        self.assertEqual(sorted(nodes), ["banner", "body", "email"])
+        self.assertEqual(nodes["body"].children, ("email", "banner"))
+        self.assertEqual(nodes["email"].attributes, {"placeholder": "email", "required": "true"})
+        self.assertEqual(nodes["banner"].text, "")
+        self.assertEqual(compact.to_compact["outer"], "email")
+        self.assertEqual(compact.state.parent_of("email").node_id, "body")
+
+    def test_renamed_ids_map_back_for_execution(self) -> None:
+        compact = DOMCompactor(rename_ids=True).compact(self.state)
+        email_id = compact.to_compact["email"]
+
+        self.assertEqual(list(compact.state.nodes), ["c0", "c1", "c2"])
+        self.assertEqual(compact.state.metadata, {f"filled:{email_id}": "false"})
+        actions = ActionGenerator().enumerate(compact.state)
+        typed = next(action for action in actions if action.action_type == "type")
+        self.assertEqual(compact.original_action(typed).node_id, "email")
+
+    def test_mock_form_keeps_every_search_action(self) -> None:
+        state = MockBrowserEnv().observe()
+        compact = DOMCompactor(rename_ids=True).compact(state)
+        generator = ActionGenerator()
+
+        self.assertLess(len(compact.state.nodes), len(state.nodes))
+        self.assertEqual(
+            sorted(compact.original_action(action).canonical() for action in generator.enumerate(compact.state)),
+            sorted(action.canonical() for action in generator.enumerate(state)),
+        )
+
+    def test_renamed_ids_keep_the_plan(self) -> None:
+        generator = ActionGenerator(default_input_text="seed")
+
+        def build_env() -> MockBrowserEnv:
+            env = MockBrowserEnv()
+            env.apply(next(action for action in generator.enumerate(env.observe()) if action.node_id == "n_name"))
+            return env
+
+        def plan(
+            env: object,
+            to_original: Callable[[Action], Action] = lambda action: action,
+        ) -> tuple[str, dict[str, float]]:
+            planner = MCTSPlanner(
+                action_generator=generator,
+                reward_model=RewardModel(),
+                prior_policy=PriorPolicy(),
+                config=MCTSConfig(simulations=60, rollout_depth=5, top_k_actions=8, seed=0),
+            )
+            result = planner.plan(env)
+            priors = {
+                to_original(result.root.child_actions[key]).canonical(): prior
+                for key, prior in result.root.child_priors.items()
+            }
+            return to_original(result.actions[0]).canonical(), priors
+
+        expected_action, expected_priors = plan(build_env())
+        kept_ids = frozenset({RewardModel.SUBMIT_NODE_ID, PriorPolicy.SUBMIT_NODE_ID})
+        for compactor in (DOMCompactor(), DOMCompactor(rename_ids=True, kept_ids=kept_ids)):
+            env = CompactingEnv(build_env(), compactor)
+            env.observe()
+            action, priors = plan(env, env.compact.original_action)
+            self.assertEqual(action, expected_action)
+            self.assertEqual(priors.keys(), expected_priors.keys())
+            for key, prior in priors.items():
+                self.assertAlmostEqual(prior, expected_priors[key])
+
+
+if __name__ == "__main__":
+    unittest.main()
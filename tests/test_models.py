@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import pickle
+import unittest
+from dataclasses import FrozenInstanceError, replace
+
+from action_space import ActionGenerator
+from core import DOMNode, DOMState, NodeMap
+from runner import MockBrowserEnv
+
+
+class FingerprintTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.state = MockBrowserEnv().observe()
+
+    def test_fingerprint_is_stable_across_clones(self) -> None:
+        self.assertEqual(self.state.fingerprint(), self.state.clone().fingerprint())
+
+    def test_incremental_updates_match_full_recompute(self) -> None:
+        self.state.fingerprint()
+        self.state.update_node("n_name", text="alice")
+        self.state.set_node(DOMNode(node_id="n_extra", tag="span", text="hint"))
+        self.state.remove_node("n_cancel")
+        incremental = self.state.fingerprint()
+
+        self.state.invalidate_fingerprint()
+        self.assertEqual(incremental, self.state.fingerprint())
+
+    def test_node_edit_changes_fingerprint(self) -> None:
+        before = self.state.fingerprint()
+        self.state.update_node("n_email", text="a@b.c")
+        self.assertNotEqual(before, self.state.fingerprint())
+
+    def test_nodes_are_immutable(self) -> None:
+        clone = self.state.clone()
+        node = clone.nodes["n_name"]
+        before = self.state.fingerprint()
+        with self.assertRaises(FrozenInstanceError):
+            node.text = "x"
+        with self.assertRaises(TypeError):
+            node.attributes["placeholder"] = "changed"
+        with self.assertRaises(AttributeError):
+            node.children.append("n_extra")
+        self.assertEqual(self.state.nodes["n_name"].attributes["placeholder"], "name")
+        self.assertEqual(self.state.fingerprint(), before)
+
+        edited = replace(node, text="changed")
+        self.assertNotEqual(edited.content_hash(), node.content_hash())
+        self.assertEqual(pickle.loads(pickle.dumps(edited)), edited)
+
+    def test_inputs_are_copied_on_construction(self) -> None:
+        attributes = {"role": "x"}
+        children = ["a"]
+        node = DOMNode(node_id="n", tag="div", attributes=attributes, children=children)
+        attributes["role"] = "y"
+        children.append("b")
+        self.assertEqual(dict(node.attributes), {"role": "x"})
+        self.assertEqual(node.children, ("a",))
+
+    def test_update_node_rejects_unknown_fields(self) -> None:
+        with self.assertRaises(AttributeError):
+            self.state.update_node("n_name", colour="red")
+
+    def test_equal_content_gives_equal_fingerprint(self) -> None:
+        rebuilt = DOMState(
+            url=self.state.url,
+            nodes={node_id: node.copy() for node_id, node in reversed(self.state.nodes.items())},
+            interaction_history=list(self.state.interaction_history),
+            metadata=dict(self.state.metadata),
+            step=self.state.step,
+        )
+        self.assertEqual(self.state.fingerprint(), rebuilt.fingerprint())
+
+
+class PersistentStateTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.state = DOMState(
+            url="https://mock.local/large",
+            nodes={
+                f"n{index:05d}": DOMNode(node_id=f"n{index:05d}", tag="div", text=str(index))
+                for index in range(5000)
+            },
+        )
+
+    def test_clone_shares_nodes_until_written(self) -> None:
+        clone = self.state.clone()
+        self.assertIs(clone.nodes["n00042"], self.state.nodes["n00042"])
+
+        clone.update_node("n00042", text="edited")
+        self.assertEqual(clone.nodes["n00042"].text, "edited")
+        self.assertEqual(self.state.nodes["n00042"].text, "42")
+        self.assertIs(clone.nodes["n04000"], self.state.nodes["n04000"])
+
+    def test_write_copies_only_the_touched_block(self) -> None:
+        clone = self.state.clone()
+        clone.update_node("n00042", text="edited")
+        clone.remove_node("n04999")
+
+        total_blocks = self.state.nodes.shares_structure_with(self.state.nodes)
+        self.assertEqual(clone.nodes.shares_structure_with(self.state.nodes), total_blocks - 2)
+
+    def test_iteration_stays_sorted_after_edits(self) -> None:
+        clone = self.state.clone()
+        clone.set_node(DOMNode(node_id="a_first", tag="span"))
+        clone.set_node(DOMNode(node_id="z_last", tag="span"))
+        clone.remove_node("n00000")
+
+        keys = list(clone.nodes)
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(clone.nodes), 5001)
+        self.assertEqual(len(self.state.nodes), 5000)
+
+    def test_plain_dicts_are_converted(self) -> None:
+        state = DOMState(url="about:blank", nodes={"b": DOMNode("b", "div"), "a": DOMNode("a", "div")})
+        self.assertIsInstance(state.nodes, NodeMap)
+        self.assertEqual(list(state.nodes), ["a", "b"])
+        self.assertEqual(state.nodes, {"a": state.nodes["a"], "b": state.nodes["b"]})
+
+
+class DOMIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.state = MockBrowserEnv().observe()
+
+    def assert_matches_rebuild(self, state: DOMState) -> None:
+        fresh = DOMState(url=state.url, nodes=NodeMap(state.nodes.items()))
+        self.assertEqual(list(state.actionable_nodes()), list(fresh.actionable_nodes()))
+        self.assertEqual(list(state.required_nodes()), list(fresh.required_nodes()))
+        for tag in ("input", "button", "div", "form", "span"):
+            self.assertEqual(list(state.nodes_by_tag(tag)), list(fresh.nodes_by_tag(tag)))
+        self.assertEqual(list(state.nodes_by_role("alert")), list(fresh.nodes_by_role("alert")))
+        for node_id in state.nodes:
+            self.assertEqual(state.parent_of(node_id), fresh.parent_of(node_id))
+
+    def test_lookups_cover_expected_nodes(self) -> None:
+        self.assertEqual(
+            [node.node_id for node in self.state.actionable_nodes()],
+            ["n_cancel", "n_email", "n_name", "n_submit"],
+        )
+        self.assertEqual([node.node_id for node in self.state.required_nodes()], ["n_email", "n_name"])
+        self.assertEqual([node.node_id for node in self.state.nodes_by_tag("button")], ["n_cancel", "n_submit"])
+        self.assertEqual(self.state.parent_of("n_name").node_id, "n_form")
+        self.assertIsNone(self.state.parent_of("n_form"))
+
+    def test_edits_keep_indexes_current(self) -> None:
+        list(self.state.actionable_nodes())
+        self.state.update_node("n_cancel", visible=False)
+        self.state.update_node("n_form", children=["n_name", "n_extra"])
+        self.state.set_node(DOMNode(node_id="n_extra", tag="span", role="alert", interactable=True))
+        self.state.remove_node("n_email")
+
+        self.assertNotIn("n_cancel", [node.node_id for node in self.state.actionable_nodes()])
+        self.assertIsNone(self.state.parent_of("n_submit"))
+        self.assertEqual(self.state.parent_of("n_extra").children, ("n_name", "n_extra"))
+        self.assert_matches_rebuild(self.state)
+
+    def test_direct_writes_to_nodes_refresh_indexes(self) -> None:
+        list(self.state.actionable_nodes())
+        del self.state.nodes["n_submit"]
+        del self.state.nodes["n_form"]
+
+        self.assertNotIn(
+            "click:n_submit:_:",
+            [action.canonical() for action in ActionGenerator().enumerate(self.state)],
+        )
+        self.assertIsNone(self.state.parent_of("n_name"))
+        self.state.update_node("n_name", interactable=False)
+        self.state.nodes["n_extra"] = DOMNode(node_id="n_extra", tag="button", interactable=True)
+        self.assert_matches_rebuild(self.state)
+        self.assert_matches_rebuild(self.state.clone())
+
+    def test_clones_share_indexes_copy_on_write(self) -> None:
+        list(self.state.actionable_nodes())
+        clone = self.state.clone()
+        self.assertIs(clone._index.actionable, self.state._index.actionable)
+
+        clone.update_node("n_name", interactable=False)
+        self.assertIn("n_name", [node.node_id for node in self.state.actionable_nodes()])
+        self.assertNotIn("n_name", [node.node_id for node in clone.actionable_nodes()])
+        self.assert_matches_rebuild(clone)
+        self.assert_matches_rebuild(self.state)
+
+    def test_out_of_order_inserts_are_sorted_on_lookup(self) -> None:
+        list(self.state.actionable_nodes())
+        clone = self.state.clone()
+        for node_id in ("a_first", "n_middle", "z_last"):
+            clone.set_node(DOMNode(node_id=node_id, tag="button", interactable=True))
+
+        ids = [node.node_id for node in clone.actionable_nodes()]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(ids[0], "a_first")
+        self.assertNotIn("a_first", [node.node_id for node in self.state.nodes_by_tag("button")])
+        self.assert_matches_rebuild(clone)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,645 @@
+from __future__ import annotations
+
+import time
+import unittest
+
+from action_space import ActionGenerator
+from benchmarks import SyntheticFormEnv, SyntheticSpec
+from reward import RewardModel
+from runner import AgentRunner, MockBrowserEnv
+from search import (
+    HeuristicEvaluator,
+    Leaf,
+    LinearValueModel,
+    MCTSConfig,
+    MCTSPlanner,
+    PriorPolicy,
+)
+from search.cache import LRUCache, MemoizedEnv, Transition
+from search.mcts import _merge_tree, _unique_nodes
+from search.policy import RankedActions
+from search.stopping import StopCondition
+from search.tree_store import ArrayTree
+from traces import TraceRecorder
+
+
+def build_planner(leaf_evaluator: object = None, **config_overrides: object) -> MCTSPlanner:
+    config = MCTSConfig(simulations=60, rollout_depth=5, top_k_actions=8)
+    for key, value in config_overrides.items():
+        setattr(config, key, value)
+    return MCTSPlanner(
+        action_generator=ActionGenerator(default_input_text="seed"),
+        reward_model=RewardModel(),
+        prior_policy=PriorPolicy(),
+        config=config,
+        leaf_evaluator=leaf_evaluator,
+    )
+
+
+class PriorPolicyTests(unittest.TestCase):
+    def test_score_batch_matches_single_scores(self) -> None:
+        policy = PriorPolicy()
+        env = MockBrowserEnv()
+        actions = ActionGenerator(default_input_text="seed").enumerate(env.observe())
+        scroll = next(action for action in actions if action.action_type == "scroll")
+        env.apply(scroll)
+        state = env.observe()
+
+        batch = policy.score_batch(state, actions)
+        self.assertEqual(batch, [policy.score(state, action) for action in actions])
+        scores = {action.canonical(): score for action, score in zip(actions, batch)}
+        self.assertAlmostEqual(scores["type:n_name:name_text:"], 0.9)
+        self.assertAlmostEqual(scores["click:n_submit:_:"], 0.2)
+        self.assertEqual(scores["click:n_cancel:_:destructive=true"], 0.01)
+        self.assertEqual(scores[scroll.canonical()], 0.01)
+
+    def test_feature_matrix_has_one_row_per_action(self) -> None:
+        policy = PriorPolicy()
+        state = MockBrowserEnv().observe()
+        actions = ActionGenerator().enumerate(state)
+        matrix = policy.feature_matrix(state, actions)
+
+        self.assertEqual(len(matrix), len(actions))
+        self.assertTrue(all(len(row) == len(PriorPolicy.FEATURES) for row in matrix))
+
+
+class CandidateCacheTests(unittest.TestCase):
+    def test_lru_evicts_least_recently_used(self) -> None:
+        cache: LRUCache[str] = LRUCache(maxsize=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        self.assertEqual(cache.get("a"), "1")
+        cache.put("c", "3")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_planner_hits_cache_without_changing_plan(self) -> None:
+        cached = build_planner()
+        uncached = build_planner(candidate_cache_size=0)
+        cached_plan = cached.plan(MockBrowserEnv())
+        uncached_plan = uncached.plan(MockBrowserEnv())
+
+        self.assertGreater(cached.candidate_cache.hit_rate, 0.5)
+        self.assertEqual(len(uncached.candidate_cache), 0)
+        self.assertEqual(
+            [action.canonical() for action in cached_plan.actions],
+            [action.canonical() for action in uncached_plan.actions],
+        )
+
+
+class TreeReuseTests(unittest.TestCase):
+    def test_advance_reuses_committed_subtree(self) -> None:
+        planner = build_planner()
+        env = MockBrowserEnv()
+        first = planner.plan(env)
+        self.assertEqual(first.simulations_run, 60)
+
+        action = first.actions[0]
+        carried_visits = first.root.children[action.canonical()].visits
+        env.apply(action)
+        planner.advance([action])
+
+        second = planner.plan(env)
+        self.assertEqual(second.simulations_run, 60 - carried_visits)
+        self.assertEqual(second.root.visits, 60)
+        self.assertIsNone(second.root.parent)
+
+    def test_reused_values_match_a_fresh_search(self) -> None:
+        planner = build_planner(seed=0)
+        env = MockBrowserEnv()
+        action = planner.plan(env).actions[0]
+        env.apply(action)
+        planner.advance([action])
+        reused = planner._root
+        fresh = build_planner(seed=0, reuse_tree=False).plan(env).root
+
+        self.assertAlmostEqual(reused.q_value, fresh.q_value, delta=0.2)
+        for key, child in reused.children.items():
+            self.assertAlmostEqual(child.q_value, fresh.children[key].q_value, delta=0.2)
+
+    def test_reuse_does_not_lengthen_mock_episode(self) -> None:
+        for seed in (None, 0, 1, 2):
+            reused = AgentRunner(planner=build_planner(seed=seed)).run_episode(MockBrowserEnv())
+            fresh = AgentRunner(planner=build_planner(seed=seed, reuse_tree=False)).run_episode(
+                MockBrowserEnv()
+            )
+            self.assertTrue(reused.success)
+            self.assertEqual(reused.steps, 3)
+            self.assertLessEqual(reused.steps, fresh.steps)
+
+    def test_mismatched_state_starts_fresh_tree(self) -> None:
+        planner = build_planner()
+        env = MockBrowserEnv()
+        planner.plan(env)
+        env.apply(planner.action_generator.enumerate(env.observe())[-1])
+
+        result = planner.plan(env)
+        self.assertEqual(result.simulations_run, 60)
+
+    def test_reuse_can_be_disabled(self) -> None:
+        planner = build_planner(reuse_tree=False)
+        env = MockBrowserEnv()
+        planner.plan(env)
+        self.assertEqual(planner.plan(env).simulations_run, 60)
+
+
+class TranspositionTests(unittest.TestCase):
+    def test_fill_order_shares_one_node(self) -> None:
+        planner = build_planner(simulations=120, transpositions=True)
+        root = planner.plan(MockBrowserEnv()).root
+
+        name_first = root.children["type:n_name:name_text:"]
+        email_first = root.children["type:n_email:email_text:"]
+        both_via_name = name_first.children.get("type:n_email:email_text:")
+        both_via_email = email_first.children.get("type:n_name:name_text:")
+
+        self.assertIsNotNone(both_via_name)
+        self.assertIs(both_via_name, both_via_email)
+
+    def test_shared_nodes_keep_each_edge_prior(self) -> None:
+        planner = build_planner(simulations=200, transpositions=True, seed=0)
+        root = planner.plan(MockBrowserEnv()).root
+
+        parents: dict[int, int] = {}
+        for node in _unique_nodes(root):
+            for child in node.children.values():
+                parents[id(child)] = parents.get(id(child), 0) + 1
+            if node.state is None:
+                continue
+            actions = planner.action_generator.enumerate(node.state)
+            priors = dict(
+                zip(
+                    (action.canonical() for action in actions),
+                    planner.prior_policy.score_batch(node.state, actions),
+                )
+            )
+            for key, prior in node.child_priors.items():
+                self.assertAlmostEqual(prior, priors[key])
+            self.assertLessEqual(sum(node.child_visits.values()), node.visits)
+        self.assertGreater(max(parents.values()), 1)
+
+    def test_advance_drops_unreachable_transpositions(self) -> None:
+        planner = build_planner(simulations=120, transpositions=True)
+        env = MockBrowserEnv()
+        action = planner.plan(env).actions[0]
+        env.apply(action)
+        planner.advance([action])
+
+        root_fingerprint = env.observe().fingerprint()
+        self.assertIn(root_fingerprint, planner._transpositions)
+        for node in planner._transpositions.values():
+            self.assertGreaterEqual(node.state.step, 1)
+
+    def test_fingerprint_ignores_interaction_order(self) -> None:
+        first = MockBrowserEnv()
+        second = MockBrowserEnv()
+        actions = {
+            action.canonical(): action
+            for action in build_planner().action_generator.enumerate(first.observe())
+        }
+        for key in ("type:n_name:name_text:", "type:n_email:email_text:"):
+            first.apply(actions[key])
+        for key in ("type:n_email:email_text:", "type:n_name:name_text:"):
+            second.apply(actions[key])
+
+        self.assertNotEqual(first.observe(), second.observe())
+        self.assertEqual(first.observe().fingerprint(), second.observe().fingerprint())
+
+
+class SnapshotRestoreTests(unittest.TestCase):
+    def test_restore_rewinds_mock_env(self) -> None:
+        env = MockBrowserEnv()
+        before = env.observe()
+        token = env.snapshot()
+        for action in build_planner().action_generator.enumerate(before):
+            env.apply(action)
+        self.assertTrue(env.is_terminal())
+
+        env.restore(token)
+        self.assertFalse(env.is_terminal())
+        self.assertEqual(env.observe(), before)
+
+    def test_restore_rejects_unknown_token(self) -> None:
+        with self.assertRaises(ValueError):
+            MockBrowserEnv().restore(3)
+
+    def test_snapshot_planning_matches_clone_planning(self) -> None:
+        env = MockBrowserEnv()
+        before = env.observe()
+        with_snapshots = build_planner().plan(env)
+        with_clones = build_planner(use_snapshots=False).plan(MockBrowserEnv())
+
+        self.assertEqual(env.observe(), before)
+        self.assertEqual(
+            [action.canonical() for action in with_snapshots.actions],
+            [action.canonical() for action in with_clones.actions],
+        )
+        self.assertEqual(with_snapshots.root.value_sum, with_clones.root.value_sum)
+
+
+class RootParallelTests(unittest.TestCase):
+    def test_workers_split_budget_and_merge_statistics(self) -> None:
+        planner = build_planner(simulations=90, workers=3, seed=7)
+        self.addCleanup(planner.close)
+        result = planner.plan(MockBrowserEnv())
+
+        self.assertEqual(result.simulations_run, 90)
+        self.assertEqual(result.root.visits, 90)
+        self.assertEqual(
+            sum(child.visits for child in result.root.children.values()),
+            90,
+        )
+        self.assertNotEqual(result.actions[0].canonical(), "click:n_cancel:_:destructive=true")
+
+    def test_workers_report_their_early_stop_and_leader(self) -> None:
+        planner = build_planner(simulations=400, workers=2, seed=1, early_stopping=True)
+        self.addCleanup(planner.close)
+        result = planner.plan(MockBrowserEnv())
+
+        self.assertEqual(result.stop_reason, "converged")
+        self.assertLess(result.simulations_run, 400)
+        root = result.root
+        leader = max(root.children, key=root.child_visits.__getitem__)
+        self.assertEqual(result.actions[0], root.child_actions[leader])
+
+    def test_merge_sums_matching_children(self) -> None:
+        first = build_planner(simulations=30, seed=1).plan(MockBrowserEnv()).root
+        second = build_planner(simulations=30, seed=2).plan(MockBrowserEnv()).root
+        expected = {
+            key: sum(tree.children[key].visits for tree in (first, second) if key in tree.children)
+            for key in set(first.children) | set(second.children)
+        }
+
+        _merge_tree(first, second)
+        self.assertEqual(first.visits, 60)
+        self.assertEqual({key: child.visits for key, child in first.children.items()}, expected)
+
+
+class SlowMockBrowserEnv(MockBrowserEnv):
+    def apply(self, action: object) -> object:
+        time.sleep(0.001)
+        return super().apply(action)
+
+
+class CountingMockBrowserEnv(MockBrowserEnv):
+    def __init__(self) -> None:
+        super().__init__()
+        self.applied = [0]
+
+    def apply(self, action: object) -> object:
+        self.applied[0] += 1
+        return super().apply(action)
+
+
+class RecordingEvaluator(HeuristicEvaluator):
+    def __init__(self) -> None:
+        super().__init__()
+        self.batch_sizes: list[int] = []
+
+    def evaluate_batch(self, leaves: list[Leaf]) -> list[float]:
+        self.batch_sizes.append(len(leaves))
+        return super().evaluate_batch(leaves)
+
+
+class TreeParallelTests(unittest.TestCase):
+    def test_threads_share_one_tree_without_leaking_virtual_loss(self) -> None:
+        planner = build_planner(simulations=80, threads=4)
+        result = planner.plan(SlowMockBrowserEnv())
+
+        self.assertEqual(result.root.visits, 80)
+        self.assertEqual(sum(child.visits for child in result.root.children.values()), 80)
+        stack = [result.root]
+        while stack:
+            node = stack.pop()
+            self.assertEqual(node.virtual_visits, 0)
+            self.assertFalse(node.expanding)
+            stack.extend(node.children.values())
+        self.assertNotEqual(result.actions[0].canonical(), "click:n_cancel:_:destructive=true")
+
+    def test_rejects_worker_processes_and_leaf_batches(self) -> None:
+        for option, value in (("workers", 2), ("leaf_batch_size", 4)):
+            with self.assertRaisesRegex(ValueError, option):
+                build_planner(HeuristicEvaluator(), threads=4, **{option: value})
+
+    def test_virtual_loss_steers_selection_away_from_in_flight_child(self) -> None:
+        planner = build_planner(simulations=40)
+        root = planner.plan(MockBrowserEnv()).root
+        _, favourite = planner._select_child(root)
+
+        favourite.virtual_visits += 50
+        _, second = planner._select_child(root)
+        self.assertIsNot(second, favourite)
+
+
+class MemoryBudgetTests(unittest.TestCase):
+    def test_max_nodes_bounds_tree_size(self) -> None:
+        unbounded = build_planner(simulations=300).plan(MockBrowserEnv())
+        planner = build_planner(simulations=300, max_nodes=20)
+        bounded = planner.plan(MockBrowserEnv())
+
+        self.assertGreater(len(_unique_nodes(unbounded.root)), 20)
+        self.assertLessEqual(len(_unique_nodes(bounded.root)), 20)
+        self.assertEqual(bounded.root.visits, 300)
+        self.assertEqual(
+            [action.canonical() for action in bounded.actions],
+            [action.canonical() for action in unbounded.actions],
+        )
+
+    def test_max_bytes_drops_interior_states_and_rebuilds_them(self) -> None:
+        planner = build_planner(simulations=300, max_bytes=20_000)
+        env = MockBrowserEnv()
+        result = planner.plan(env)
+        evicted = [node for node in _unique_nodes(result.root) if node.state is None]
+        self.assertTrue(evicted)
+        self.assertLessEqual(planner._tree_bytes, 20_000)
+        self.assertIsNotNone(result.root.state)
+
+        runner_result = AgentRunner(planner=planner).run_episode(env)
+        self.assertTrue(runner_result.success)
+
+
+class ArrayTreeTests(unittest.TestCase):
+    def test_expand_allocates_contiguous_children(self) -> None:
+        tree = ArrayTree()
+        state = MockBrowserEnv().observe()
+        root = tree.add_root(state)
+        actions = ActionGenerator().enumerate(state)
+        children = tree.expand(root, actions, [0.1] * len(actions))
+
+        self.assertEqual(list(children), list(range(1, len(actions) + 1)))
+        self.assertTrue(all(tree.parent[child] == root for child in children))
+        self.assertFalse(tree.is_expanded(children[0]))
+
+    def test_select_and_backpropagate_follow_puct(self) -> None:
+        tree = ArrayTree(discount=0.5)
+        state = MockBrowserEnv().observe()
+        root = tree.add_root(state)
+        actions = ActionGenerator().enumerate(state)[:3]
+        low, high, _ = tree.expand(root, actions, [0.1, 0.8, 0.1])
+
+        self.assertEqual(tree.select_child(root, 1.4), high)
+        tree.backpropagate([root, high], [-1.0], -4.0)
+        tree.backpropagate([root, low], [1.0], 2.5)
+        self.assertEqual(tree.value_sum[root], -1.5)
+        self.assertEqual((tree.reward_sum[high], tree.value_sum[high]), (-1.0, -8.0))
+        self.assertEqual(tree.edge_q(high), -5.0)
+        self.assertEqual(tree.select_child(root, 1.4), low)
+        self.assertEqual(tree.best_path(root, 3), [low])
+
+    def test_planner_with_array_store_solves_mock_form(self) -> None:
+        planner = build_planner(tree_store="arrays")
+        result = planner.plan(MockBrowserEnv())
+
+        self.assertIsNotNone(result.tree)
+        self.assertEqual(result.root.visits, 60)
+        self.assertNotEqual(result.actions[0].canonical(), "click:n_cancel:_:destructive=true")
+        self.assertTrue(AgentRunner(planner=planner).run_episode(MockBrowserEnv()).success)
+
+    def test_array_store_rejects_modes_it_does_not_implement(self) -> None:
+        for option, value in (
+            ("transpositions", True),
+            ("workers", 2),
+            ("threads", 2),
+            ("root_selection", "gumbel"),
+            ("expansion", "progressive"),
+            ("leaf_batch_size", 4),
+            ("max_nodes", 100),
+            ("max_bytes", 1 << 20),
+        ):
+            with self.assertRaisesRegex(ValueError, option):
+                build_planner(tree_store="arrays", **{option: value})
+
+
+class AnytimePlanningTests(unittest.TestCase):
+    def test_full_budget_reports_budget(self) -> None:
+        result = build_planner().plan(MockBrowserEnv())
+        self.assertEqual((result.simulations_run, result.stop_reason), (60, "budget"))
+
+    def test_expired_deadline_still_runs_min_simulations(self) -> None:
+        planner = build_planner(min_simulations=7)
+        result = planner.plan(MockBrowserEnv(), deadline=time.monotonic() - 1.0)
+
+        self.assertEqual(result.stop_reason, "deadline")
+        self.assertEqual(result.simulations_run, 7)
+        self.assertEqual(result.root.visits, 7)
+        self.assertTrue(result.actions)
+
+    def test_time_budget_applies_without_explicit_deadline(self) -> None:
+        result = build_planner(simulations=10_000, time_budget=0.05).plan(MockBrowserEnv())
+        self.assertEqual(result.stop_reason, "deadline")
+        self.assertLess(result.simulations_run, 10_000)
+
+    def test_early_stopping_keeps_the_decision(self) -> None:
+        full = build_planner(simulations=400).plan(MockBrowserEnv())
+        early = build_planner(simulations=400, early_stopping=True).plan(MockBrowserEnv())
+
+        self.assertIn(early.stop_reason, ("decided", "converged"))
+        self.assertLess(early.simulations_run, 400)
+        self.assertEqual(early.actions[0].canonical(), full.actions[0].canonical())
+
+    def test_early_stop_returns_the_visit_leader_it_judged(self) -> None:
+        spec = SyntheticSpec(fields=4, distractors=2, pages=2)
+        stopped = 0
+        for seed in range(6):
+            for tree_store in ("nodes", "arrays"):
+                planner = build_planner(
+                    simulations=300,
+                    early_stopping=True,
+                    seed=seed,
+                    tree_store=tree_store,
+                )
+                result = planner.plan(SyntheticFormEnv(spec))
+                if result.stop_reason not in ("decided", "converged"):
+                    continue
+                stopped += 1
+                leader = max(result.root.children.values(), key=lambda child: child.visits)
+                self.assertEqual(result.actions[0], leader.action_from_parent)
+        self.assertGreater(stopped, 0)
+
+    def test_unreachable_runner_up_is_decided(self) -> None:
+        stop = StopCondition(simulations=100, early_stopping=True)
+        self.assertFalse(stop.should_stop(60, [40, 20]))
+        self.assertIsNone(stop.leader)
+        self.assertTrue(stop.should_stop(70, [19, 50]))
+        self.assertEqual(stop.reason, "decided")
+        self.assertEqual(stop.leader, 1)
+
+
+class ProgressiveWideningTests(unittest.TestCase):
+    def test_ranked_actions_match_stable_sort(self) -> None:
+        state = MockBrowserEnv().observe()
+        actions = ActionGenerator().enumerate(state)
+        priors = [0.3, 0.1, 0.3, 0.9, 0.1][: len(actions)]
+        ranking = RankedActions(actions, priors)
+        expected = sorted(zip(actions, priors), key=lambda pair: pair[1], reverse=True)
+
+        self.assertEqual(ranking.take(2), expected[:2])
+        self.assertEqual(ranking.take(len(actions) + 3), expected)
+        self.assertEqual(len(ranking), len(actions))
+
+    def test_child_count_grows_with_visits(self) -> None:
+        fixed = build_planner(simulations=3).plan(MockBrowserEnv())
+        widened = build_planner(simulations=3, expansion="progressive").plan(MockBrowserEnv())
+
+        self.assertEqual(len(fixed.root.children), 3)
+        self.assertEqual(len(widened.root.children), 2)
+
+    def test_widening_reaches_actions_beyond_top_k(self) -> None:
+        planner = build_planner(simulations=200, top_k_actions=2, expansion="progressive")
+        result = planner.plan(MockBrowserEnv())
+
+        self.assertGreater(len(result.root.children), 2)
+        self.assertTrue(AgentRunner(planner=planner).run_episode(MockBrowserEnv()).success)
+
+
+class GumbelRootTests(unittest.TestCase):
+    def test_sequential_halving_spends_exact_budget(self) -> None:
+        result = build_planner(simulations=20, root_selection="gumbel", seed=3).plan(MockBrowserEnv())
+
+        self.assertEqual(result.simulations_run, 20)
+        self.assertEqual(result.root.visits, 20)
+        self.assertIn(result.actions[0].canonical(), result.root.children)
+        self.assertNotEqual(result.actions[0].canonical(), "click:n_cancel:_:destructive=true")
+
+    def test_small_budget_solves_form_in_few_steps(self) -> None:
+        for seed in range(5):
+            planner = build_planner(simulations=12, root_selection="gumbel", seed=seed)
+            result = AgentRunner(planner=planner).run_episode(MockBrowserEnv())
+            self.assertTrue(result.success)
+            self.assertLessEqual(result.steps, 4)
+
+    def test_rejects_parallel_and_batched_search(self) -> None:
+        for option, value in (("workers", 2), ("threads", 2), ("leaf_batch_size", 4)):
+            with self.assertRaisesRegex(ValueError, option):
+                build_planner(HeuristicEvaluator(), root_selection="gumbel", **{option: value})
+        # Rollout leaves are never batched, so the batch size does not apply.
+        build_planner(root_selection="gumbel", leaf_batch_size=4)
+
+
+class LeafEvaluatorTests(unittest.TestCase):
+    def test_heuristic_evaluator_skips_rollout_env_steps(self) -> None:
+        rollout_env = CountingMockBrowserEnv()
+        heuristic_env = CountingMockBrowserEnv()
+        build_planner().plan(rollout_env)
+        result = build_planner(HeuristicEvaluator()).plan(heuristic_env)
+
+        self.assertLess(heuristic_env.applied[0], rollout_env.applied[0])
+        self.assertNotEqual(result.actions[0].canonical(), "click:n_cancel:_:destructive=true")
+
+    def test_heuristic_values_follow_reward_model_and_planner_discount(self) -> None:
+        class DoubledRewards(RewardModel):
+            def evaluate(self, **kwargs: object) -> object:
+                breakdown = super().evaluate(**kwargs)
+                breakdown.total *= 2
+                return breakdown
+
+        state = MockBrowserEnv().observe()
+        leaf = Leaf(
+            state=state,
+            env=None,
+            depth=0,
+            discount=1.0,
+            discount_factor=0.5,
+            remaining=3,
+            terminal=False,
+        )
+        evaluator = HeuristicEvaluator(DoubledRewards())
+
+        self.assertAlmostEqual(evaluator.fill_value, 2 * 0.68)
+        self.assertAlmostEqual(evaluator.submit_value, 2 * 1.98)
+        self.assertAlmostEqual(
+            evaluator.evaluate(leaf),
+            evaluator.fill_value * 1.5 + evaluator.submit_value * 0.25,
+        )
+
+    def test_leaves_are_evaluated_in_batches(self) -> None:
+        evaluator = RecordingEvaluator()
+        planner = build_planner(evaluator, simulations=30, leaf_batch_size=8)
+        result = planner.plan(MockBrowserEnv())
+
+        self.assertEqual(evaluator.batch_sizes, [8, 8, 8, 6])
+        self.assertEqual(result.root.visits, 30)
+        self.assertTrue(all(node.virtual_visits == 0 for node in _unique_nodes(result.root)))
+        self.assertTrue(AgentRunner(planner=planner).run_episode(MockBrowserEnv()).success)
+
+    def test_linear_model_fit_recovers_weights(self) -> None:
+        env = MockBrowserEnv()
+        actions = {action.canonical(): action for action in ActionGenerator().enumerate(env.observe())}
+        states = [env.observe()]
+        states.append(env.apply(actions["type:n_name:name_text:"]))
+        states.append(env.apply(actions["type:n_email:email_text:"]))
+        truth = (0.5, -0.25, 0.75, 1.0, 0.0, 0.0)
+        returns = [sum(w * x for w, x in zip(truth, LinearValueModel.features(state))) for state in states]
+
+        model = LinearValueModel.fit(states, returns, ridge=1e-9)
+        for state, target in zip(states, returns):
+            self.assertAlmostEqual(model.predict(state), target, places=4)
+
+    def test_linear_model_from_recorded_transitions(self) -> None:
+        recorder = TraceRecorder(keep_transitions=True)
+        for seed in range(3):
+            AgentRunner(planner=build_planner(seed=seed), trace_recorder=recorder).run_episode(
+                MockBrowserEnv()
+            )
+        model = LinearValueModel.from_transitions(recorder.transitions, RewardModel())
+
+        # Every recorded episode filled both fields and submitted from here.
+        self.assertGreater(model.predict(MockBrowserEnv().observe()), 2.0)
+        planner = build_planner(model)
+        self.assertTrue(AgentRunner(planner=planner).run_episode(MockBrowserEnv()).success)
+
+
+class TransitionCacheTests(unittest.TestCase):
+    def test_memoized_env_replays_skipped_actions_before_a_miss(self) -> None:
+        cache: LRUCache[Transition] = LRUCache(maxsize=16)
+        actions = {
+            action.canonical(): action
+            for action in ActionGenerator(default_input_text="seed").enumerate(MockBrowserEnv().observe())
+        }
+        name = actions["type:n_name:name_text:"]
+        email = actions["type:n_email:email_text:"]
+        MemoizedEnv(MockBrowserEnv(), cache).apply(name)
+
+        env = CountingMockBrowserEnv()
+        memoized = MemoizedEnv(env, cache)
+        memoized.apply(name)
+        self.assertEqual(env.applied[0], 0)
+        self.assertEqual(memoized.observe().metadata["filled:n_name"], "true")
+
+        memoized.apply(email)
+        self.assertEqual((env.applied[0], memoized.replayed), (2, 1))
+        self.assertEqual(env.observe(), memoized.observe())
+
+    def test_deterministic_cache_skips_env_without_changing_search(self) -> None:
+        plain_env = CountingMockBrowserEnv()
+        cached_env = CountingMockBrowserEnv()
+        plain = build_planner(simulations=200).plan(plain_env)
+        planner = build_planner(
+            simulations=200,
+            transition_cache_size=4096,
+            deterministic_transitions=True,
+        )
+        cached = planner.plan(cached_env)
+
+        self.assertLess(cached_env.applied[0] * 5, plain_env.applied[0])
+        self.assertEqual(cached.root.value_sum, plain.root.value_sum)
+        self.assertEqual(
+            [action.canonical() for action in cached.actions],
+            [action.canonical() for action in plain.actions],
+        )
+        self.assertTrue(AgentRunner(planner=planner).run_episode(MockBrowserEnv()).success)
+
+    def test_cache_requires_determinism(self) -> None:
+        with self.assertRaisesRegex(ValueError, "deterministic_transitions"):
+            build_planner(transition_cache_size=4096)
+
+    def test_deterministic_cache_memoizes_rewards(self) -> None:
+        planner = build_planner(transition_cache_size=4096, deterministic_transitions=True)
+        planner.plan(MockBrowserEnv())
+        self.assertTrue(all(entry.reward is not None for entry in planner.transition_cache._entries.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
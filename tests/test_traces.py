@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import gzip
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from action_space import ActionGenerator
+from reward import RewardModel
+from runner import AgentRunner, MockBrowserEnv
+from search import MCTSConfig, MCTSPlanner, PriorPolicy
+from traces import (
+    BackgroundWriter,
+    JSONLSink,
+    ReplayEnv,
+    RingBufferSink,
+    RotatingGzipSink,
+    TraceRecorder,
+    TransitionTable,
+    read_records,
+)
+
+
+def build_planner() -> MCTSPlanner:
+    return MCTSPlanner(
+        action_generator=ActionGenerator(default_input_text="seed"),
+        reward_model=RewardModel(),
+        prior_policy=PriorPolicy(),
+        config=MCTSConfig(simulations=40, rollout_depth=5, top_k_actions=8),
+    )
+
+
+def run_traced_episode(recorder: TraceRecorder):
+    return AgentRunner(planner=build_planner(), trace_recorder=recorder).run_episode(
+        MockBrowserEnv()
+    )
+
+
+class TraceSinkTests(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def test_ring_buffer_keeps_newest_records(self) -> None:
+        sink = RingBufferSink(capacity=3)
+        sink.write([{"n": index} for index in range(5)])
+        self.assertEqual(sink.records(), [{"n": 2}, {"n": 3}, {"n": 4}])
+
+    def test_recorder_memory_is_bounded(self) -> None:
+        recorder = TraceRecorder(max_in_memory=2, keep_transitions=True)
+        run_traced_episode(recorder)
+
+        self.assertEqual(len(recorder.events), 2)
+        self.assertEqual(len(recorder.transitions), 2)
+        self.assertTrue(recorder.events[-1].success)
+        self.assertEqual(len(recorder.to_dict()["plans"]), 2)
+
+    def test_recorder_memory_is_bounded_by_default(self) -> None:
+        recorder = TraceRecorder(sink=RingBufferSink(), keep_transitions=True)
+        for records in (recorder.events, recorder.plans, recorder.transitions):
+            self.assertEqual(records.maxlen, 10_000)
+
+    def test_background_jsonl_writer_records_plans_events_and_trees(self) -> None:
+        path = self.directory / "trace.jsonl"
+        writer = BackgroundWriter(JSONLSink(path), batch_size=4, flush_interval=0.01)
+        recorder = TraceRecorder(sink=writer, record_trees=True, tree_depth=1)
+        run_traced_episode(recorder)
+        recorder.close()
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        plans = [record for record in records if record["kind"] == "plan"]
+        events = [record for record in records if record["kind"] == "event"]
+        self.assertEqual(len(events), len(recorder.events))
+        self.assertEqual(len(recorder.transitions), 0)
+        self.assertEqual([plan["actions"] for plan in plans], list(recorder.plans))
+        tree = plans[0]["tree"]
+        self.assertEqual(tree["visits"], 40)
+        self.assertTrue(all("children" not in child for child in tree["children"].values()))
+        self.assertIsNone(writer.error)
+
+    def test_gzip_segments_rotate_and_expire(self) -> None:
+        sink = RotatingGzipSink(self.directory, max_bytes=200, max_segments=2)
+        sink.write([{"index": index, "pad": "x" * 40} for index in range(20)])
+        sink.close()
+
+        self.assertEqual(sorted(self.directory.glob("*.gz")), sink.segments)
+        self.assertEqual(len(sink.segments), 2)
+        self.assertNotEqual(sink.segments[0].name, "trace-00000.jsonl.gz")
+        with gzip.open(sink.segments[-1], "rt", encoding="utf-8") as handle:
+            last = [json.loads(line) for line in handle]
+        self.assertEqual(last[-1]["index"], 19)
+
+    def test_gzip_segments_resume_after_a_previous_run(self) -> None:
+        first = RotatingGzipSink(self.directory, max_bytes=1000, max_segments=2)
+        first.write([{"run": 1}])
+        first.close()
+        second = RotatingGzipSink(self.directory, max_bytes=1000, max_segments=2)
+        second.write([{"run": 2}])
+        second.close()
+
+        names = [path.name for path in sorted(self.directory.glob("*.gz"))]
+        self.assertEqual(names, ["trace-00000.jsonl.gz", "trace-00001.jsonl.gz"])
+        with gzip.open(self.directory / names[0], "rt", encoding="utf-8") as handle:
+            self.assertEqual(json.loads(handle.readline()), {"run": 1})
+
+        third = RotatingGzipSink(self.directory, max_bytes=1000, max_segments=2)
+        third.write([{"run": 3}])
+        third.close()
+        self.assertEqual(
+            [path.name for path in third.segments],
+            ["trace-00001.jsonl.gz", "trace-00002.jsonl.gz"],
+        )
+        self.assertEqual(sorted(self.directory.glob("*.gz")), third.segments)
+
+    def test_background_writer_drops_instead_of_blocking(self) -> None:
+        sink = RingBufferSink()
+        writer = BackgroundWriter(sink, max_pending=1, flush_interval=0.5)
+        writer.write([{"n": index} for index in range(50)])
+        writer.close()
+
+        self.assertEqual(len(sink.records()) + writer.dropped, 50)
+        self.assertGreater(writer.dropped, 0)
+
+
+class ReplayEnvTests(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "trace.jsonl"
+        self.recorder = TraceRecorder(sink=JSONLSink(path), record_transitions=True, keep_transitions=True)
+        run_traced_episode(self.recorder)
+        self.recorder.close()
+        self.table = TransitionTable.from_records(read_records(path))
+
+    def test_replays_recorded_episode_offline(self) -> None:
+        self.assertEqual(len(self.table), len(self.recorder.transitions))
+        env = ReplayEnv(self.table, unknown_action="raise")
+        self.assertEqual(env.observe(), self.recorder.transitions[0][0])
+
+        for prev_state, action, next_state in self.recorder.transitions:
+            self.assertEqual(env.observe().fingerprint(), prev_state.fingerprint())
+            self.assertEqual(env.apply(action), next_state)
+        self.assertTrue(env.is_terminal())
+        self.assertTrue(env.is_success())
+        self.assertEqual(env.misses, 0)
+
+    def test_unrecorded_actions_follow_the_policy(self) -> None:
+        first_action = self.recorder.transitions[0][1]
+        stray = ActionGenerator().enumerate(self.table.initial_states[0])
+        stray = next(action for action in stray if action.canonical() != first_action.canonical())
+
+        with self.assertRaises(KeyError):
+            ReplayEnv(self.table, unknown_action="raise").apply(stray)
+
+        env = ReplayEnv(self.table, unknown_action="fail")
+        token = env.snapshot()
+        env.apply(stray)
+        self.assertTrue(env.is_terminal())
+        self.assertFalse(env.is_success())
+        self.assertEqual(env.misses, 1)
+        env.restore(token)
+        self.assertFalse(env.is_terminal())
+
+    def test_only_episode_starts_are_initial_states(self) -> None:
+        sink = RingBufferSink()
+        recorder = TraceRecorder(sink=sink, record_transitions=True)
+        env = MockBrowserEnv()
+        actions = {action.canonical(): action for action in ActionGenerator().enumerate(env.observe())}
+        start = env.observe()
+        name = actions["type:n_name:name_text:"]
+        recorder.record_action(start, name, env.apply(name))
+        env.apply(actions["type:n_email:email_text:"])
+        resync = env.observe()
+        submit = next(action for key, action in actions.items() if key.startswith("click:n_submit"))
+        recorder.record_action(resync, submit, env.apply(submit))
+        run_traced_episode(recorder)
+
+        table = TransitionTable.from_records(sink.records())
+        self.assertEqual(len([record for record in sink.records() if record["kind"] == "state"]), 3)
+        self.assertEqual(table.initial_states, [start, MockBrowserEnv().observe()])
+
+    def test_planner_reaches_success_on_replayed_trace(self) -> None:
+        result = AgentRunner(planner=build_planner()).run_episode(
+            ReplayEnv(self.table, unknown_action="fail")
+        )
+        self.assertTrue(result.success)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,19 @@
 """Trace utilities for search and execution diagnostics."""
 
-from .recorder import TraceRecorder
+from .recorder import TraceRecorder, summarize_tree
+from .replay import RecordedTransition, ReplayEnv, TransitionTable, read_records
+from .sinks import BackgroundWriter, JSONLSink, RingBufferSink, RotatingGzipSink, TraceSink
 
-__all__ = ["TraceRecorder"]
+__all__ = [
+    "BackgroundWriter",
+    "JSONLSink",
+    "RecordedTransition",
+    "ReplayEnv",
+    "RingBufferSink",
+    "RotatingGzipSink",
+    "TraceRecorder",
+    "TraceSink",
+    "TransitionTable",
+    "read_records",
+    "summarize_tree",
+]
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import asdict, dataclass
+from typing import Any
 
 from action_space.actions import Action
 from core.models import DOMState
+from dom_encoder.encoder import DOMEncoder
+from traces.replay import action_to_record
+from traces.sinks import TraceSink
 
 
 @dataclass
@@ -15,32 +20,144 @@ class TraceEvent:
 
 
 class TraceRecorder:
-    """Minimal in-memory recorder for baseline replayability."""
+    """Recorder for baseline replayability.
 
-    def __init__(self) -> None:
-        self.events: list[TraceEvent] = []
-        self.plans: list[list[str]] = []
+    Plans and events are kept in memory, capped at the newest
+    `max_in_memory` of each; pass None to keep everything.
+    `keep_transitions` also keeps the (prev, action, next) states, e.g. for
+    `LinearValueModel.from_transitions`. With a `sink`, every plan and event
+    is also written out as a JSON record, and `record_trees` adds a summary
+    of the search tree, `tree_depth` levels deep, to each plan record. Wrap
+    slow sinks in `BackgroundWriter` to keep writes off the agent loop.
 
-    def record_plan(self, actions: list[Action]) -> None:
-        self.plans.append([action.canonical() for action in actions])
+    `record_transitions` also writes what `TransitionTable` needs to replay
+    the run offline. A "state" record holds a full snapshot whenever an
+    action does not continue from the previous action's result, and the
+    first one after `start_episode()` is marked "initial". Each
+    "transition" record holds the action, terminal/success flags and the
+    `DOMEncoder.diff` from its previous state.
+    """
+
+    def __init__(
+        self,
+        sink: TraceSink | None = None,
+        max_in_memory: int | None = 10_000,
+        record_trees: bool = False,
+        tree_depth: int = 2,
+        record_transitions: bool = False,
+        keep_transitions: bool = False,
+    ) -> None:
+        self.sink = sink
+        self.record_trees = record_trees
+        self.tree_depth = tree_depth
+        self.record_transitions = record_transitions
+        self._encoder = DOMEncoder()
+        self._last_fingerprint: int | None = None
+        self._episode_started = True
+        self.events: deque[TraceEvent] = deque(maxlen=max_in_memory)
+        self.plans: deque[list[str]] = deque(maxlen=max_in_memory)
+        self.transitions: deque[tuple[DOMState, Action, DOMState]] = deque(
+            maxlen=max_in_memory if keep_transitions else 0
+        )
+
+    def start_episode(self) -> None:
+        """Marks the next recorded state as the start of a new episode."""
+        self._episode_started = True
+
+    def record_plan(self, actions: list[Action], root: Any = None) -> None:
+        keys = [action.canonical() for action in actions]
+        self.plans.append(keys)
+        if self.sink is not None:
+            record: dict[str, object] = {"kind": "plan", "actions": keys}
+            if self.record_trees and root is not None:
+                record["tree"] = summarize_tree(root, self.tree_depth)
+            self.sink.write([record])
 
     def record_action(
         self,
         prev_state: DOMState,
         action: Action,
         next_state: DOMState,
+        terminal: bool | None = None,
+        success: bool | None = None,
     ) -> None:
-        self.events.append(
-            TraceEvent(
-                step=next_state.step,
-                action=action.canonical(),
-                url=prev_state.url,
-                success=next_state.metadata.get("success") == "true",
-            )
+        event = TraceEvent(
+            step=next_state.step,
+            action=action.canonical(),
+            url=prev_state.url,
+            success=next_state.metadata.get("success") == "true" if success is None else success,
+        )
+        self.transitions.append((prev_state, action, next_state))
+        self.events.append(event)
+        if self.sink is None:
+            return
+
+        records: list[dict] = []
+        if self.record_transitions:
+            records.extend(self._transition_records(prev_state, action, next_state, terminal, event.success))
+        records.append({"kind": "event", **asdict(event)})
+        self.sink.write(records)
+
+    def _transition_records(
+        self,
+        prev_state: DOMState,
+        action: Action,
+        next_state: DOMState,
+        terminal: bool | None,
+        success: bool,
+    ) -> list[dict]:
+        records: list[dict] = []
+        fingerprint = prev_state.fingerprint()
+        if fingerprint != self._last_fingerprint or self._episode_started:
+            record: dict[str, object] = {"kind": "state", "fingerprint": fingerprint}
+            if self._episode_started:
+                record["initial"] = True
+            record["snapshot"] = self._encoder.decode(prev_state)
+            records.append(record)
+            self._episode_started = False
+        next_fingerprint = next_state.fingerprint()
+        records.append(
+            {
+                "kind": "transition",
+                "state": fingerprint,
+                "action": action_to_record(action),
+                "next_state": next_fingerprint,
+                "delta": self._encoder.diff(prev_state, next_state),
+                "terminal": success if terminal is None else terminal,
+                "success": success,
+            }
         )
+        self._last_fingerprint = next_fingerprint
+        return records
+
+    def close(self) -> None:
+        if self.sink is not None:
+            self.sink.close()
 
     def to_dict(self) -> dict[str, object]:
         return {
-            "plans": self.plans,
+            "plans": list(self.plans),
             "events": [asdict(event) for event in self.events],
         }
+
+
+def summarize_tree(root: Any, depth: int) -> dict[str, object]:
+    """Visit and value statistics of a search tree, cut off after `depth` levels.
+
+    Each child reports its edge's prior and visits and its own-state value.
+    """
+    summary: dict[str, object] = {"visits": root.visits, "q": round(root.q_value, 6)}
+    if depth > 0 and root.children:
+        summary["children"] = {
+            key: {
+                **summarize_tree(child, depth - 1),
+                "prior": round(root.child_priors[key], 6),
+                "visits": root.child_visits[key],
+            }
+            for key, child in sorted(
+                root.children.items(),
+                key=lambda item: root.child_visits[item[0]],
+                reverse=True,
+            )
+        }
+    return summary
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import gzip
+import json
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from action_space.actions import Action
+from core.models import DOMState
+from dom_encoder.encoder import DOMEncoder
+
+UnknownActionPolicy = Literal["stay", "fail", "raise"]
+
+
+@dataclass(frozen=True)
+class RecordedTransition:
+    next_state: DOMState
+    terminal: bool
+    success: bool
+
+
+def action_to_record(action: Action) -> dict:
+    return {
+        "action_type": action.action_type,
+        "node_id": action.node_id,
+        "value": action.value,
+        "metadata": dict(action.metadata),
+    }
+
+
+def action_from_record(record: dict) -> Action:
+    return Action(
+        action_type=record["action_type"],
+        node_id=record.get("node_id"),
+        value=record.get("value"),
+        metadata=record.get("metadata") or {},
+    )
+
+
+def read_records(path: str | Path) -> Iterator[dict]:
+    """Yields the JSON records of a `.jsonl` or `.jsonl.gz` trace file."""
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+class TransitionTable:
+    """Recorded (state fingerprint, action key) -> outcome lookups for replay.
+
+    Built from the "state" and "transition" records a `TraceRecorder` writes
+    with `record_transitions=True`. States are rebuilt with
+    `DOMEncoder.encode_delta`, so consecutive states share unchanged nodes.
+    """
+
+    def __init__(self) -> None:
+        self.states: dict[int, DOMState] = {}
+        self.initial_states: list[DOMState] = []
+        self._transitions: dict[tuple[int, str], RecordedTransition] = {}
+
+    def __len__(self) -> int:
+        return len(self._transitions)
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[dict],
+        encoder: DOMEncoder | None = None,
+    ) -> TransitionTable:
+        encoder = encoder or DOMEncoder()
+        table = cls()
+        for record in records:
+            kind = record.get("kind")
+            if kind == "state":
+                state = encoder.encode(record["snapshot"])
+                table._check(state, record["fingerprint"])
+                if record.get("initial"):
+                    table.initial_states.append(state)
+                table.states[state.fingerprint()] = state
+            elif kind == "transition":
+                prev_state = table.states.get(record["state"])
+                if prev_state is None:
+                    raise ValueError(f"Transition from unrecorded state {record['state']}")
+                next_state = encoder.encode_delta(prev_state, record["delta"])
+                table._check(next_state, record["next_state"])
+                fingerprint = next_state.fingerprint()
+                next_state = table.states.setdefault(fingerprint, next_state)
+                action = action_from_record(record["action"])
+                table._transitions[(record["state"], action.canonical())] = RecordedTransition(
+                    next_state=next_state,
+                    terminal=bool(record["terminal"]),
+                    success=bool(record["success"]),
+                )
+        return table
+
+    def get(self, state: DOMState, action: Action) -> RecordedTransition | None:
+        return self._transitions.get((state.fingerprint(), action.canonical()))
+
+    def _check(self, state: DOMState, fingerprint: int) -> None:
+        if state.fingerprint() != fingerprint:
+            raise ValueError(f"Rebuilt state does not match recorded fingerprint {fingerprint}")
+
+
+class ReplayEnv:
+    """Browser env that serves recorded transitions instead of a live page.
+
+    `unknown_action` decides what an unrecorded (state, action) pair does:
+    "stay" leaves the state as it is, "fail" ends the episode unsuccessfully,
+    and "raise" raises `KeyError`. A callable receives the state and action
+    and returns the `RecordedTransition` to take. Unrecorded pairs are
+    counted in `misses`.
+    """
+
+    def __init__(
+        self,
+        table: TransitionTable,
+        start: DOMState | None = None,
+        unknown_action: UnknownActionPolicy
+        | Callable[[DOMState, Action], RecordedTransition] = "stay",
+    ) -> None:
+        if start is None:
+            if not table.initial_states:
+                raise ValueError("Trace has no initial state; pass start explicitly")
+            start = table.initial_states[0]
+        self.table = table
+        self.unknown_action = unknown_action
+        self.misses = 0
+        self._current = RecordedTransition(next_state=start, terminal=False, success=False)
+        self._history: list[RecordedTransition] = []
+
+    def observe(self) -> DOMState:
+        return self._current.next_state
+
+    def apply(self, action: Action) -> DOMState:
+        if self._current.terminal:
+            return self.observe()
+        transition = self.table.get(self._current.next_state, action)
+        if transition is None:
+            self.misses += 1
+            transition = self._unknown(action)
+        self._history.append(self._current)
+        self._current = transition
+        return transition.next_state
+
+    def clone(self) -> ReplayEnv:
+        env = ReplayEnv(self.table, self._current.next_state, self.unknown_action)
+        env._current = self._current
+        return env
+
+    def snapshot(self) -> int:
+        return len(self._history)
+
+    def restore(self, token: int) -> None:
+        if not 0 <= token <= len(self._history):
+            raise ValueError(f"Unknown snapshot token: {token!r}")
+        if token < len(self._history):
+            self._current = self._history[token]
+            del self._history[token:]
+
+    def is_terminal(self) -> bool:
+        return self._current.terminal
+
+    def is_success(self) -> bool:
+        return self._current.success
+
+    def _unknown(self, action: Action) -> RecordedTransition:
+        state = self._current.next_state
+        if callable(self.unknown_action):
+            return self.unknown_action(state, action)
+        if self.unknown_action == "raise":
+            raise KeyError(f"No recorded transition for {action.canonical()!r}")
+        if self.unknown_action == "fail":
+            return RecordedTransition(next_state=state, terminal=True, success=False)
+        return RecordedTransition(next_state=state, terminal=False, success=False)
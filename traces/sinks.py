@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import gzip
+import json
+import queue
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import IO, Protocol, runtime_checkable
+
+
+@runtime_checkable
+class TraceSink(Protocol):
+    """Destination for JSON-serializable trace records, written in batches."""
+
+    def write(self, records: list[dict]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class RingBufferSink:
+    """Keeps only the most recent `capacity` records in memory."""
+
+    def __init__(self, capacity: int = 10_000) -> None:
+        self._records: deque[dict] = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+
+    def write(self, records: list[dict]) -> None:
+        with self._lock:
+            self._records.extend(records)
+
+    def records(self) -> list[dict]:
+        with self._lock:
+            return list(self._records)
+
+    def close(self) -> None:
+        pass
+
+
+class JSONLSink:
+    """Appends one JSON object per line to `path`."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._handle: IO[str] | None = self.path.open("a", encoding="utf-8")
+
+    def write(self, records: list[dict]) -> None:
+        if self._handle is None:
+            raise ValueError("Sink is closed")
+        self._handle.write("".join(_encode(record) for record in records))
+        self._handle.flush()
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class RotatingGzipSink:
+    """Writes gzip-compressed JSONL segments and rolls over by size.
+
+    A segment is closed once `max_bytes` of uncompressed JSONL have gone into
+    it. Segments are named `<prefix>-00000.jsonl.gz`, `<prefix>-00001...`, and
+    only the newest `max_segments` are kept when that limit is set. A sink
+    opened on a directory that already holds segments continues their
+    numbering and counts them towards `max_segments`; it never overwrites
+    an existing file.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        prefix: str = "trace",
+        max_bytes: int = 16 * 1024 * 1024,
+        max_segments: int | None = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_bytes = max(1, max_bytes)
+        self.max_segments = max_segments
+        self.segments = self._existing_segments()
+        self._handle: IO[str] | None = None
+        self._written = 0
+        self._next_segment = 0
+        if self.segments:
+            self._next_segment = _segment_number(self.segments[-1], prefix) + 1
+        self._closed = False
+
+    def write(self, records: list[dict]) -> None:
+        if self._closed:
+            raise ValueError("Sink is closed")
+        for record in records:
+            line = _encode(record)
+            if self._handle is None or self._written >= self.max_bytes:
+                self._rotate()
+            self._handle.write(line)
+            self._written += len(line.encode("utf-8"))
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        self._closed = True
+
+    def _rotate(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+        path = self.directory / f"{self.prefix}-{self._next_segment:05d}.jsonl.gz"
+        self._next_segment += 1
+        self.segments.append(path)
+        self._handle = gzip.open(path, "xt", encoding="utf-8")
+        self._written = 0
+        if self.max_segments is not None:
+            while len(self.segments) > self.max_segments:
+                self.segments.pop(0).unlink(missing_ok=True)
+
+    def _existing_segments(self) -> list[Path]:
+        paths = [
+            path
+            for path in self.directory.glob("*.jsonl.gz")
+            if _segment_number(path, self.prefix) is not None
+        ]
+        return sorted(paths, key=lambda path: _segment_number(path, self.prefix))
+
+
+class BackgroundWriter:
+    """Moves another sink's writes onto a daemon thread.
+
+    `write` only enqueues. The thread hands records to the wrapped sink in
+    batches of up to `batch_size`, or whatever arrived within
+    `flush_interval` seconds of a batch's first record. Once `max_pending`
+    records are waiting, new records are dropped and counted in `dropped`
+    rather than blocking the caller. The last error raised by the wrapped
+    sink is kept in `error`.
+    """
+
+    def __init__(
+        self,
+        sink: TraceSink,
+        batch_size: int = 256,
+        flush_interval: float = 0.25,
+        max_pending: int = 100_000,
+    ) -> None:
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.error: Exception | None = None
+        self._queue: queue.Queue[dict | None] = queue.Queue(maxsize=max(1, max_pending))
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, records: list[dict]) -> None:
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+    def flush(self) -> None:
+        """Blocks until every record queued so far has reached the sink."""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self.sink.close()
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            batch: list[dict] = []
+            stop = first is None
+            if not stop:
+                batch.append(first)
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                else:
+                    batch.append(record)
+            try:
+                if batch:
+                    self.sink.write(batch)
+            except Exception as exc:  # keep draining so flush() and close() never hang
+                self.error = exc
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+
+
+def _segment_number(path: Path, prefix: str) -> int | None:
+    match = re.fullmatch(rf"{re.escape(prefix)}-(\d+)\.jsonl\.gz", path.name)
+    return int(match.group(1)) if match else None
+
+
+def _encode(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"